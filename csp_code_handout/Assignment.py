@@ -2,7 +2,10 @@
 # Original code by Håkon Måløy
 # Updated by Xavier Sánchez Díaz
 
+from abc import ABC, abstractmethod
 import copy
+from collections import deque
+import heapq
 from itertools import product as prod
 import string
 import sys
@@ -12,7 +15,176 @@ import time
 
 start = time.time()
 
+
+class Constraint(ABC):
+    """A binary constraint stored for an arc (i, j) in
+    CSP.constraints. The constraint is kept in intensional form, so the
+    legal value pairs are never enumerated when the CSP is built.
+    Subclasses must define `allows`.
+    """
+
+    @abstractmethod
+    def allows(self, x, y) -> bool:
+        """Return True if value 'x' of the first variable and value
+        'y' of the second variable satisfy the constraint.
+        """
+
+    def supports(self, x, values: list) -> list:
+        """Return the values in 'values' that are compatible with
+        value 'x' of the first variable.
+        """
+        return [y for y in values if self.allows(x, y)]
+
+    def conjoin(self, other: 'Constraint') -> 'Constraint':
+        """Return a constraint that only allows the value pairs
+        allowed by both this constraint and 'other'.
+        """
+        return PredicateConstraint(self.allows, other.allows)
+
+
+class AllDifferentConstraint(Constraint):
+    """Alldiff over a list of variables. A single instance is shared
+    by all the arcs between the variables, where it acts as x != y.
+    """
+
+    def __init__(self, variables: list):
+        self.variables = list(variables)
+
+    def allows(self, x, y) -> bool:
+        return x != y
+
+    def supports(self, x, values: list) -> list:
+        return [y for y in values if y != x]
+
+    def conjoin(self, other: Constraint) -> Constraint:
+        if isinstance(other, AllDifferentConstraint):
+            # Both are x != y on this arc
+            return self
+        return super().conjoin(other)
+
+
+class PredicateConstraint(Constraint):
+    """Constraint given by one or more functions that must all return
+    True for a legal value pair.
+    """
+
+    def __init__(self, *predicates: callable):
+        self.predicates = predicates
+
+    def allows(self, x, y) -> bool:
+        for predicate in self.predicates:
+            if not predicate(x, y):
+                return False
+        return True
+
+
+class TableConstraint(Constraint):
+    """Constraint given by the list of its legal value pairs, indexed
+    by the value of the first variable.
+    """
+
+    def __init__(self, pairs):
+        self.table = {}
+        for (x, y) in pairs:
+            self.table.setdefault(x, set()).add(y)
+
+    def allows(self, x, y) -> bool:
+        return y in self.table.get(x, ())
+
+    def supports(self, x, values: list) -> list:
+        legal = self.table.get(x, ())
+        return [y for y in values if y in legal]
+
+
+class SupportTable(dict):
+    """Support masks of an arc (i, j) for the bitmask engine, keyed by
+    the bit position of a value of 'i'. The mask of a value is built from
+    the constraint the first time it is looked up, so values that AC-3
+    never revises never cost a call to the constraint.
+    """
+
+    def __init__(self, csp: 'CSP', constraint: Constraint, values: list):
+        """
+        Parameters
+        ----------
+        csp : CSP
+            The CSP, compiled by compile_bitmask
+        constraint : Constraint
+            The constraint of the arc
+        values : list
+            The domain of 'j'
+        """
+        super().__init__()
+        self.csp = csp
+        self.constraint = constraint
+        self.values = values
+
+    def __missing__(self, position: int) -> int:
+        x = self.csp.bit_values[position]
+        mask = self.csp.values_to_mask(self.constraint.supports(x,
+                                                                self.values))
+        self[position] = mask
+        return mask
+
+
+def luby(i: int) -> int:
+    """Return the 'i'-th number (starting from 1) of the Luby sequence
+    1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8, ...
+
+    Parameters
+    ----------
+    i : int
+        Position in the sequence
+
+    Returns
+    -------
+    int
+        The number at that position
+    """
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    if i != (1 << k) - 1:
+        # The positions after 2^(k-1) - 1 repeat the sequence
+        return luby(i - (1 << (k - 1)) + 1)
+    return 1 << (k - 1)
+
+
+class RestartSearch(Exception):
+    """Raised by the bitmask engine when a run of a restarting search
+    has used up its number of backtracks.
+    """
+
+
 class CSP:
+    # Variable orderings of the bitmask engine. All of them select from
+    # the smallest non-empty domain-size bucket, and differ in how they
+    # break ties within it:
+    # - 'mrv': the first variable found, in O(1)
+    # - 'degree': the variable with the most neighbours
+    # - 'mrv/wdeg': the variable with the highest failure weight, which
+    #   is bumped for both variables of an arc that wipes out a domain
+    #   and for every variable of a failed Alldiff. This is not dom/wdeg,
+    #   which divides the domain size by the sum of the weights of the
+    #   constraints of the variable
+    # 'degree' and 'mrv/wdeg' keep a heap of each bucket, ordered by
+    # score, and take its top in amortized O(log bucket size)
+    VARIABLE_ORDERINGS = ('mrv', 'degree', 'mrv/wdeg')
+
+    # Variable ordering of the learning search when none is given. The
+    # learning search is sensitive to how ties between the smallest
+    # domains are broken: taking the first of them, as 'mrv' and the scan
+    # without an ordering do, some sparse Sudoku boards take thousands of
+    # backtracks or more where most take a few dozen. The failure weights
+    # of 'mrv/wdeg' steer away from the variables of earlier conflicts
+    # and cut that tail
+    LEARNING_ORDERING = 'mrv/wdeg'
+
+    # Restart policies, giving the number of backtracks of run 'i' as a
+    # multiple of the restart base
+    RESTART_POLICIES = {'luby': luby,
+                        'geometric': lambda i: int(1.5 ** (i - 1))}
+
     def __init__(self):
         # self.variables is a list of the variable names in the CSP
         self.variables = []
@@ -20,14 +192,113 @@ class CSP:
         # self.domains is a dictionary of domains (lists)
         self.domains = {}
 
-        # self.constraints[i][j] is a list of legal value pairs for
-        # the variable pair (i, j)
+        # self.constraints[i][j] is the Constraint for the variable
+        # pair (i, j)
         self.constraints = {}
 
+        # self.all_different_constraints is a list of every Alldiff
+        # added with add_all_different_constraint
+        self.all_different_constraints = []
+
+        # self.arcs is a tuple of all arcs (i, j) and
+        # self.neighboring_arcs[j] is a tuple of all arcs (i, j) going
+        # into 'j'. They are rebuilt by build_arc_index the first time
+        # they are needed after a new arc has been added
+        self.arcs = ()
+        self.neighboring_arcs = {}
+        self.arc_index_stale = False
+
+        # compile_bitmask keeps its result until the CSP is changed:
+        # self.bitmask_stale is set when a variable or constraint is
+        # added, and self.bitmask_gac is the gac option the arcs of the
+        # bitmask engine were indexed for
+        self.bitmask_stale = True
+        self.bitmask_gac = None
+
         self.backtracks = 0
         self.failed = 0
         self.domainSum = 0 
 
+        # self.trail is the undo-log of the domain reductions made
+        # since the search started, or None when every branch works on
+        # its own copy of the assignment
+        self.trail = None
+
+        # self.gac tells the bitmask engine to propagate every Alldiff
+        # as one global constraint instead of as binary x != y arcs
+        self.gac = False
+
+        # self.ordering is the variable ordering of the bitmask engine
+        # (see VARIABLE_ORDERINGS). With an ordering, self.buckets[size]
+        # is the set of undecided variables whose domain has 'size'
+        # values, and bit 'size' of self.bucket_sizes is set when that
+        # set is not empty
+        self.ordering = None
+        self.buckets = None
+        self.bucket_sizes = 0
+
+        # With 'degree' and 'mrv/wdeg', self.bucket_heaps[size] is a heap
+        # of (-score, tie, var) entries for the variables of
+        # self.buckets[size], scored by self.bucket_scores. An entry is
+        # pushed when a variable enters a bucket or its score changes,
+        # and entries that are no longer true are dropped from the top
+        self.bucket_heaps = None
+        self.bucket_scores = None
+
+        # self.lcv orders the values of the bitmask engine by how few
+        # values they remove from the neighbouring domains
+        self.lcv = False
+
+        # With self.incremental, the propagation after a decision starts
+        # from the arcs (and groups) of the decided variable only, since
+        # the rest of the network was arc consistent before it.
+        # self.residues[(i, j, x)] is the last value of 'j' found to
+        # support value 'x' of 'i' by the list engine (AC-3 with
+        # residual supports)
+        self.incremental = True
+        self.residues = {}
+
+        # With self.learning, the bitmask engine explains every removed
+        # value by a bitmask of the decision levels it depends on, jumps
+        # back over decisions that are not part of a conflict, and keeps
+        # the conflicts in self.nogoods. self.decisions is the stack of
+        # (variable, bit) decisions, self.conflict the conflict of the
+        # last failure and self.backjumps counts the jumps
+        self.learning = False
+        self.decisions = []
+        self.conflict = 0
+        self.nogoods = []
+        self.nogood_index = {}
+        self.max_nogoods = 10000
+        self.backjumps = 0
+
+        # With restarts, the bitmask engine gives up a run once
+        # self.backtracks passes self.backtrack_limit, and starts again
+        # from the root. self.random breaks ties in the variable and
+        # value orderings, so that every run searches differently
+        self.backtrack_limit = float('inf')
+        self.random = None
+        self.restarts = 0
+
+        # Statistics of the last search, see statistics(). A group
+        # propagation counts as one revision. self.depth is the number
+        # of decisions on the current branch
+        self.revisions = 0
+        self.pruned = 0
+        self.enqueued = 0
+        self.depth = 0
+        self.max_depth = 0
+        self.seconds = 0.0
+        self.propagation_seconds = 0.0
+
+        # self.trace, if set, is called as trace(event, **details) on
+        # the events of the search:
+        #   'decision'  variable, value, depth
+        #   'failure'   variable, depth (every value of 'variable' failed)
+        #   'solution'  depth
+        #   'restart'   run (the number of the run that starts)
+        self.trace = None
+
     def add_variable(self, name: str, domain: list):
         """Add a new variable to the CSP.
 
@@ -41,6 +312,8 @@ class CSP:
         self.variables.append(name)
         self.domains[name] = list(domain)
         self.constraints[name] = {}
+        self.arc_index_stale = True
+        self.bitmask_stale = True
 
     def get_all_possible_pairs(self, a: list, b: list) -> list[tuple]:
         """Get a list of all possible pairs (as tuples) of the values in
@@ -61,20 +334,34 @@ class CSP:
         """
         return prod(a, b)
 
-    def get_all_arcs(self) -> list[tuple]:
-        """Get a list of all arcs/constraints that have been defined in
-        the CSP.
+    def build_arc_index(self):
+        """Rebuild `self.arcs` and `self.neighboring_arcs` from the
+        constraints that have been defined in the CSP.
+        """
+        self.arcs = tuple((i, j) for i in self.constraints
+                          for j in self.constraints[i])
+        neighboring_arcs = {var: [] for var in self.constraints}
+        for (i, j) in self.arcs:
+            neighboring_arcs[j].append((i, j))
+        self.neighboring_arcs = {var: tuple(arcs)
+                                 for var, arcs in neighboring_arcs.items()}
+        self.arc_index_stale = False
+
+    def get_all_arcs(self) -> tuple[tuple]:
+        """Get all arcs/constraints that have been defined in the CSP.
 
         Returns
         -------
-        list[tuple]
-            A list of tuples in the form (i, j), which represent a
+        tuple[tuple]
+            A tuple of tuples in the form (i, j), which represent a
             constraint between variable `i` and `j`
         """
-        return [(i, j) for i in self.constraints for j in self.constraints[i]]
+        if self.arc_index_stale:
+            self.build_arc_index()
+        return self.arcs
 
-    def get_all_neighboring_arcs(self, var: str) -> list[tuple]:
-        """Get a list of all arcs/constraints going to/from variable 'var'.
+    def get_all_neighboring_arcs(self, var: str) -> tuple[tuple]:
+        """Get all arcs/constraints going to variable 'var'.
 
         Parameters
         ----------
@@ -83,17 +370,40 @@ class CSP:
 
         Returns
         -------
-        list[tuple]
-            A list of all arcs/constraints in which `var` is involved
+        tuple[tuple]
+            A tuple of all arcs/constraints (i, var)
+        """
+        if self.arc_index_stale:
+            self.build_arc_index()
+        return self.neighboring_arcs[var]
+
+    def get_decision_arcs(self, var: str) -> tuple:
+        """Get the arcs to start AC-3 with after 'var' has been
+        decided: all arcs (i, var) going into 'var' when the search is
+        incremental, and all arcs of the CSP otherwise.
+
+        Parameters
+        ----------
+        var : str
+            Name of the decided variable
+
+        Returns
+        -------
+        tuple[tuple]
+            The arcs to queue
         """
-        return [(i, var) for i in self.constraints[var]]
+        if self.incremental:
+            return self.get_all_neighboring_arcs(var)
+        return self.get_all_arcs()
 
     def add_constraint_one_way(self, i: str, j: str,
                                filter_function: callable):
         """Add a new constraint between variables 'i' and 'j'. Legal
         values are specified by supplying a function 'filter_function',
         that should return True for legal value pairs, and False for
-        illegal value pairs.
+        illegal value pairs, or by supplying a Constraint. If there
+        already is a constraint from 'i' to 'j', a value pair must
+        satisfy both of them.
 
         NB! This method only adds the constraint one way, from i -> j.
         You must ensure to call the function the other way around, in
@@ -106,24 +416,42 @@ class CSP:
             Name of the first variable
         j : str
             Name of the second variable
-        filter_function : callable
+        filter_function : callable | Constraint
             A callable (function name) that needs to return a boolean.
             This will filter value pairs which pass the condition and
             keep away those that don't pass your filter.
         """
+        if isinstance(filter_function, Constraint):
+            constraint = filter_function
+        else:
+            constraint = PredicateConstraint(filter_function)
+
+        self.bitmask_stale = True
         if j not in self.constraints[i]:
-            # First, get a list of all possible pairs of values
-            # between variables i and j
-            self.constraints[i][j] = self.get_all_possible_pairs(
-                                        self.domains[i],
-                                        self.domains[j])
-
-        # Next, filter this list of value pairs through the function
-        # 'filter_function', so that only the legal value pairs remain
-        self.constraints[i][j] = list(filter(lambda
-                                             value_pair:
-                                             filter_function(*value_pair),
-                                             self.constraints[i][j]))
+            self.arc_index_stale = True
+            self.constraints[i][j] = constraint
+        else:
+            self.constraints[i][j] = self.constraints[i][j].conjoin(
+                                        constraint)
+
+    def add_table_constraint(self, i: str, j: str, pairs: list):
+        """Add a constraint between variables 'i' and 'j' in both
+        directions, given by the list of legal value pairs.
+
+        Parameters
+        ----------
+        i : str
+            Name of the first variable
+        j : str
+            Name of the second variable
+        pairs : list
+            List of legal pairs (x, y), where 'x' is a value of 'i' and
+            'y' is a value of 'j'
+        """
+        pairs = list(pairs)
+        self.add_constraint_one_way(i, j, TableConstraint(pairs))
+        self.add_constraint_one_way(j, i, TableConstraint(
+                                        (y, x) for (x, y) in pairs))
 
     def add_all_different_constraint(self, var_list: list):
         """Add an Alldiff constraint between all of the variables in the
@@ -134,15 +462,304 @@ class CSP:
         var_list : list
             A list of variable names
         """
+        constraint = AllDifferentConstraint(var_list)
+        self.all_different_constraints.append(constraint)
+        self.bitmask_stale = True
         for (i, j) in self.get_all_possible_pairs(var_list, var_list):
             if i != j:
-                self.add_constraint_one_way(i, j, lambda x, y: x != y)
+                self.add_constraint_one_way(i, j, constraint)
+
+    def compile_bitmask(self, gac: bool = False):
+        """Build the integer-indexed form of the CSP that is used by the
+        bitmask engine.
+
+        Every distinct value found in the domains gets a bit position in
+        `self.bit_values`, so a domain becomes a single int where bit
+        `b` is set when `self.bit_values[b]` is still legal. For every
+        arc (i, j), `self.bit_supports[i][j][b]` is the mask of values
+        of `j` that are compatible with value `b` of `i`. It is a
+        SupportTable, filled in as the search looks values up, and
+        shared by the arcs with the same constraint and domain of `j`.
+        Arcs of an Alldiff need no table, their entry is None and
+        revise_bitmask handles them as x != y.
+
+        `self.bit_groups` lists the variable indices of every Alldiff in
+        `self.all_different_constraints`.
+
+        The result is kept until a variable or constraint is added, so
+        solving the same CSP again skips this step.
+
+        Parameters
+        ----------
+        gac : bool
+            Leave the arcs of the Alldiff groups out of `self.bit_arcs`,
+            because propagate_all_different takes care of them
+        """
+        if not self.bitmask_stale:
+            if self.bitmask_gac != gac:
+                self.index_bitmask(gac)
+            return
+
+        self.bit_values = []
+        self.bit_positions = {}
+        for var in self.variables:
+            for value in self.domains[var]:
+                if value not in self.bit_positions:
+                    self.bit_positions[value] = len(self.bit_values)
+                    self.bit_values.append(value)
+
+        self.var_index = {var: k for k, var in enumerate(self.variables)}
+        self.bit_domains = [self.values_to_mask(self.domains[var])
+                            for var in self.variables]
+
+        self.bit_groups = tuple(tuple(self.var_index[var]
+                                      for var in constraint.variables)
+                                for constraint
+                                in self.all_different_constraints)
+
+        self.bit_supports = []
+        tables = {}
+        for var in self.variables:
+            supports = {}
+            for j, constraint in self.constraints[var].items():
+                if isinstance(constraint, AllDifferentConstraint):
+                    supports[self.var_index[j]] = None
+                else:
+                    values = self.domains[j]
+                    key = (id(constraint), tuple(values))
+                    if key not in tables:
+                        tables[key] = SupportTable(self, constraint, values)
+                    supports[self.var_index[j]] = tables[key]
+            self.bit_supports.append(supports)
+
+        self.bitmask_stale = False
+        self.index_bitmask(gac)
+
+    def index_bitmask(self, gac: bool):
+        """Number the arcs of the bitmask engine and index them by
+        variable, from `self.bit_supports` and `self.bit_groups`.
+
+        `self.bit_var_groups[k]` lists the groups variable `k` belongs
+        to. With 'gac', an Alldiff arc between two variables of the same
+        group is left out of `self.bit_arcs`, because the group already
+        keeps them different.
+
+        Parameters
+        ----------
+        gac : bool
+            The option of compile_bitmask
+        """
+        var_groups = [[] for var in self.variables]
+        for group, variables in enumerate(self.bit_groups):
+            for var in variables:
+                var_groups[var].append(group)
+        self.bit_var_groups = tuple(tuple(groups) for groups in var_groups)
+        self.bit_matchings = [[0] * len(variables)
+                              for variables in self.bit_groups]
+
+        # Arcs are numbered, so that AC-3 can keep arc ids in its queue
+        # and mark the queued arcs in a bytearray
+        arcs = []
+        for i, supports in enumerate(self.bit_supports):
+            for j, table in supports.items():
+                if (gac and table is None
+                        and not set(var_groups[i]).isdisjoint(var_groups[j])):
+                    continue
+                arcs.append((i, j))
+        self.bit_arcs = tuple(arcs)
+        self.bitmask_gac = gac
+
+        # self.bit_neighboring_arcs[j] holds an (arc id, i) pair for
+        # every arc (i, j) going into 'j'
+        neighboring_arcs = [[] for var in self.variables]
+        for arc, (i, j) in enumerate(self.bit_arcs):
+            neighboring_arcs[j].append((arc, i))
+        self.bit_neighboring_arcs = tuple(tuple(arcs)
+                                          for arcs in neighboring_arcs)
+        self.bit_incoming_arcs = tuple(tuple(arc for (arc, i) in arcs)
+                                       for arcs in neighboring_arcs)
+
+    def values_to_mask(self, values: list) -> int:
+        """Convert a list of values into a domain bitmask.
+
+        Parameters
+        ----------
+        values : list
+            Values that must be known to `compile_bitmask`
+
+        Returns
+        -------
+        int
+            Mask with the bit of every value in `values` set
+        """
+        mask = 0
+        for value in values:
+            mask |= 1 << self.bit_positions[value]
+        return mask
+
+    def mask_to_values(self, mask: int) -> list:
+        """Convert a domain bitmask back into a list of values.
+
+        Parameters
+        ----------
+        mask : int
+            Domain bitmask
+
+        Returns
+        -------
+        list
+            The values whose bits are set in `mask`, in bit order
+        """
+        values = []
+        while mask:
+            bit = mask & -mask
+            values.append(self.bit_values[bit.bit_length() - 1])
+            mask ^= bit
+        return values
+
+    def get_all_bitmask_arcs(self) -> range:
+        """Same as `get_all_arcs`, but as ids of the arcs in
+        `self.bit_arcs`.
+
+        Returns
+        -------
+        range
+            The ids of all arcs
+        """
+        return range(len(self.bit_arcs))
+
+    def get_decision_bitmask_arcs(self, var: int) -> tuple:
+        """Bitmask version of `get_decision_arcs`.
 
-    def backtracking_search(self):
+        Parameters
+        ----------
+        var : int
+            Index of the decided variable
+
+        Returns
+        -------
+        tuple | range
+            Ids of the arcs to start the propagation with
+        """
+        if self.incremental:
+            return self.bit_incoming_arcs[var]
+        return self.get_all_bitmask_arcs()
+
+    def get_decision_groups(self, var: int):
+        """Get the ids of the Alldiff groups to propagate after 'var'
+        has been decided, like `get_decision_bitmask_arcs`.
+
+        Parameters
+        ----------
+        var : int
+            Index of the decided variable
+
+        Returns
+        -------
+        tuple | range
+            Ids of the groups to start the propagation with
+        """
+        if self.incremental and self.gac:
+            return self.bit_var_groups[var]
+        return self.get_all_bitmask_groups()
+
+    def get_all_bitmask_groups(self) -> range:
+        """Get the ids of the Alldiff groups in `self.bit_groups` that
+        are propagated as global constraints.
+
+        Returns
+        -------
+        range
+            The ids of all groups, or an empty range if the search does
+            not use the global Alldiff propagator
+        """
+        return range(len(self.bit_groups) if self.gac else 0)
+
+    def backtracking_search(self, bitmask: bool = False, trail: bool = False,
+                            gac: bool = False, ordering: str = None,
+                            lcv: bool = False, learning: bool = False,
+                            restarts: str = None, restart_base: int = 32,
+                            seed: int = None, assumptions: list = None,
+                            incremental: bool = True):
         """This functions starts the CSP solver and returns the found
         solution.
+
+        Parameters
+        ----------
+        bitmask : bool
+            Solve with the bitmask engine, which keeps every domain as
+            an int and a partial assignment as a flat list of ints,
+            instead of deep-copying dictionaries of lists. The returned
+            solution has the same format in both cases.
+        trail : bool
+            Work on a single assignment and record every domain
+            reduction on `self.trail`, so that a failed branch is rolled
+            back instead of every branch getting its own copy
+        gac : bool
+            Propagate every Alldiff as a single global constraint with
+            generalized arc consistency (see propagate_all_different).
+            Requires the bitmask engine.
+        ordering : str
+            One of `VARIABLE_ORDERINGS`, to select variables from
+            domain-size buckets that are kept up to date as values are
+            pruned, instead of scanning all variables at every node.
+            Requires the bitmask engine with a trail, which is used to
+            put variables back in their buckets on backtracking.
+        lcv : bool
+            Try the least constraining value first. Requires the bitmask
+            engine.
+        learning : bool
+            Use conflict-directed backjumping and nogood recording (see
+            backtrack_learning). Requires the bitmask engine with a
+            trail. Without an ordering, `LEARNING_ORDERING` is used.
+        restarts : str
+            One of `RESTART_POLICIES`. Every run stops after a cutoff on
+            the number of backtracks, and the search restarts from the
+            root with randomised tie-breaking in the variable and value
+            orderings. Nogoods and failure weights are kept from one
+            run to the next. Requires the bitmask engine with a trail
+            and a variable ordering.
+        restart_base : int
+            Number of backtracks that the restart policy is scaled by
+        seed : int
+            Seed for the tie-breaking of restarts
+        assumptions : list
+            (variable, value) pairs that are decided before the search
+            starts, to solve only that part of the search space.
+            Requires the bitmask engine.
+        incremental : bool
+            After a decision, only queue the arcs going into the decided
+            variable instead of all arcs. Both reach the same fixpoint,
+            so this only changes the number of revisions.
         """
-        
+        self.configure_search(bitmask, trail, gac, ordering, lcv, learning,
+                              restarts, seed, assumptions, incremental)
+        started = time.perf_counter()
+        try:
+            return self.run_search(bitmask, trail, learning, restarts,
+                                   restart_base, assumptions)
+        finally:
+            self.seconds = time.perf_counter() - started
+
+    def run_search(self, bitmask: bool, trail: bool, learning: bool,
+                   restarts: str, restart_base: int, assumptions: list):
+        """The search of backtracking_search, once the options have
+        been stored by configure_search."""
+        if bitmask:
+            masks = self.root_masks(assumptions)
+            if masks is None:
+                return None
+            if restarts is not None:
+                result = self.restart_search(masks, restarts, restart_base)
+            elif learning:
+                result = self.backtrack_learning(masks)
+            else:
+                result = self.backtrack_bitmask(masks)
+            if result is None:
+                return None
+            return {var: self.mask_to_values(mask)
+                    for var, mask in zip(self.variables, result)}
+
         # Make a so-called "deep copy" of the dictionary containing the
         # domains of the CSP variables. The deep copy is required to
         # ensure that any changes made to 'assignment' does not have any
@@ -150,14 +767,341 @@ class CSP:
         assignment = copy.deepcopy(self.domains)
 
         # Run AC-3 on all constraints in the CSP, to weed out all of the
-        # values that are not arc-consistent to begin with
-        self.inference(assignment, self.get_all_arcs())
+        # values that are not arc-consistent to begin with. If that
+        # wipes out a domain, there is no solution to search for
+        if not self.inference(assignment, self.get_all_arcs()):
+            return None
 
 
 
         # Call backtrack with the partial assignment 'assignment'
+        if trail:
+            return self.backtrack_trail(assignment)
         return self.backtrack(assignment)
 
+    def iter_solutions(self, gac: bool = False, ordering: str = None,
+                       lcv: bool = False, assumptions: list = None):
+        """Generate all solutions of the CSP, one at a time.
+
+        The search runs the bitmask engine with a trail, so the
+        propagation done for a node is shared by all of its children,
+        and moving on to the next sibling only undoes the reductions of
+        the last one. Only the current branch is kept in memory, not the
+        solutions found so far. The options are the ones of
+        backtracking_search with the same names.
+
+        Yields
+        ------
+        dict
+            A solution, in the format of backtracking_search
+        """
+        for masks in self.enumerate_masks(gac, ordering, lcv, assumptions):
+            yield {var: self.mask_to_values(mask)
+                   for var, mask in zip(self.variables, masks)}
+
+    def count_solutions(self, limit: int = None, gac: bool = False,
+                        ordering: str = None, lcv: bool = False,
+                        assumptions: list = None) -> int:
+        """Count the solutions of the CSP, without decoding them.
+
+        Parameters
+        ----------
+        limit : int
+            Stop counting at 'limit' solutions. count_solutions(limit=2)
+            == 1 tells whether a puzzle has a unique solution.
+
+        The other options are the ones of iter_solutions.
+
+        Returns
+        -------
+        int
+            The number of solutions, at most 'limit'
+        """
+        if limit is not None and limit <= 0:
+            return 0
+        count = 0
+        for masks in self.enumerate_masks(gac, ordering, lcv, assumptions):
+            count += 1
+            if limit is not None and count >= limit:
+                break
+        return count
+
+    def enumerate_masks(self, gac: bool, ordering: str, lcv: bool,
+                        assumptions: list):
+        """Set up the bitmask engine for iter_solutions and
+        count_solutions, and generate the domain bitmasks of every
+        solution. The yielded list is changed by the search afterwards.
+        """
+        self.configure_search(True, True, gac, ordering, lcv, False,
+                              None, None, assumptions)
+        # The time the caller spends between two solutions is left out
+        started = time.perf_counter()
+        masks = self.root_masks(assumptions)
+        if masks is not None:
+            for solution in self.enumerate_bitmask(masks):
+                self.seconds += time.perf_counter() - started
+                yield solution
+                started = time.perf_counter()
+        self.seconds += time.perf_counter() - started
+
+    def enumerate_bitmask(self, masks: list):
+        """Version of `backtrack_bitmask` with a trail that goes on
+        after a solution has been found.
+
+        Parameters
+        ----------
+        masks : list
+            The partial assignment as domain bitmasks
+
+        Yields
+        ------
+        list
+            'masks', every time it holds a complete assignment
+        """
+        variable = self.select_unassigned_variable_bitmask(masks)
+        if variable is None:
+            if self.trace is not None:
+                self.trace('solution', depth=self.depth)
+            yield masks
+            return
+
+        self.backtracks = self.backtracks + 1
+
+        name = self.variables[variable]
+        found = False
+        for bit in self.order_values_bitmask(masks, variable):
+            mark = len(self.trail)
+            self.enter_decision(name, self.bit_values[bit.bit_length() - 1])
+            self.set_mask(masks, variable, bit)
+            if self.inference_bitmask(masks,
+                                      self.get_decision_bitmask_arcs(variable),
+                                      self.get_decision_groups(variable)):
+                for solution in self.enumerate_bitmask(masks):
+                    found = True
+                    yield solution
+            self.undo_bitmask(masks, mark)
+            self.depth = self.depth - 1
+        if not found:
+            self.leave_node(name)
+
+    def configure_search(self, bitmask: bool, trail: bool, gac: bool,
+                         ordering: str, lcv: bool, learning: bool,
+                         restarts: str, seed: int, assumptions: list,
+                         incremental: bool = True):
+        """Check the options of backtracking_search (see there) and
+        store them on the CSP for the methods of the search.
+        """
+        if gac and not bitmask:
+            raise ValueError("gac requires the bitmask engine")
+        if ordering is not None:
+            if ordering not in self.VARIABLE_ORDERINGS:
+                raise ValueError("unknown variable ordering %r" % ordering)
+            if not (bitmask and trail):
+                raise ValueError("ordering requires bitmask and trail")
+        if lcv and not bitmask:
+            raise ValueError("lcv requires the bitmask engine")
+        if learning and not (bitmask and trail):
+            raise ValueError("learning requires bitmask and trail")
+        if learning and ordering is None:
+            ordering = self.LEARNING_ORDERING
+        if restarts is not None:
+            if restarts not in self.RESTART_POLICIES:
+                raise ValueError("unknown restart policy %r" % restarts)
+            if ordering is None:
+                raise ValueError("restarts require a variable ordering")
+        if assumptions and not bitmask:
+            raise ValueError("assumptions require the bitmask engine")
+
+        self.trail = [] if trail else None
+        self.gac = gac
+        self.ordering = ordering
+        self.buckets = None
+        self.bucket_heaps = None
+        self.lcv = lcv
+        self.learning = learning
+        self.incremental = incremental
+        self.residues = {}
+        self.backtrack_limit = float('inf')
+        self.random = random.Random(seed) if restarts else None
+        self.reset_statistics()
+
+    def reset_statistics(self):
+        """Set all counters of `statistics` back to zero."""
+        self.backtracks = 0
+        self.failed = 0
+        self.domainSum = 0
+        self.backjumps = 0
+        self.restarts = 0
+        self.revisions = 0
+        self.pruned = 0
+        self.enqueued = 0
+        self.depth = 0
+        self.max_depth = 0
+        self.seconds = 0.0
+        self.propagation_seconds = 0.0
+
+    def statistics(self) -> dict:
+        """Return the statistics of the last search.
+
+        Returns
+        -------
+        dict
+            backtracks      nodes where a variable was decided
+            failed          nodes where every value failed
+            backjumps       nodes left by backjumping (with learning)
+            restarts        runs given up (with restarts)
+            nogoods         nogoods kept (with learning)
+            revisions       arcs revised and Alldiff groups propagated
+            pruned          values removed by propagation
+            enqueued        arcs and groups put on the propagation queue
+            max_depth       deepest number of decisions on a branch
+            seconds         time spent in the search
+            propagation_seconds
+                            part of 'seconds' spent propagating
+            search_seconds  the rest of 'seconds'
+            nodes_per_second
+                            backtracks per second
+        """
+        return {'backtracks': self.backtracks,
+                'failed': self.failed,
+                'backjumps': self.backjumps,
+                'restarts': self.restarts,
+                'nogoods': len(self.nogoods) if self.learning else 0,
+                'revisions': self.revisions,
+                'pruned': self.pruned,
+                'enqueued': self.enqueued,
+                'max_depth': self.max_depth,
+                'seconds': self.seconds,
+                'propagation_seconds': self.propagation_seconds,
+                'search_seconds': self.seconds - self.propagation_seconds,
+                'nodes_per_second': (self.backtracks / self.seconds
+                                     if self.seconds else 0.0)}
+
+    def enter_decision(self, var: str, value):
+        """Count a decision one level below the current one, and
+        report it to `self.trace`. The caller lowers `self.depth` again
+        when it returns from the decision.
+
+        Parameters
+        ----------
+        var : str
+            Name of the decided variable
+        value
+            The value it is given
+        """
+        self.depth = self.depth + 1
+        if self.depth > self.max_depth:
+            self.max_depth = self.depth
+        if self.trace is not None:
+            self.trace('decision', variable=var, value=value,
+                       depth=self.depth)
+
+    def leave_node(self, var: str):
+        """Count a node where every value of 'var' failed, and report
+        it to `self.trace`."""
+        self.failed = self.failed + 1
+        if self.trace is not None:
+            self.trace('failure', variable=var, depth=self.depth)
+
+    def root_masks(self, assumptions: list = None):
+        """Compile the CSP for the bitmask engine with the options set
+        by backtracking_search, decide the 'assumptions', and run the
+        propagation at the root of the search.
+
+        Parameters
+        ----------
+        assumptions : list
+            (variable, value) pairs to decide
+
+        Returns
+        -------
+        list | None
+            The domain bitmasks at the root, or None if propagation
+            shows that there is no solution
+        """
+        self.compile_bitmask(self.gac)
+        masks = list(self.bit_domains)
+        for (var, value) in assumptions or ():
+            k = self.var_index[var]
+            masks[k] &= 1 << self.bit_positions[value]
+            if not masks[k]:
+                return None
+        if self.ordering is not None:
+            self.fill_buckets(masks)
+        if self.learning:
+            self.bit_explanations = [[0] * len(self.bit_values)
+                                     for var in self.variables]
+            self.decisions = []
+            self.nogoods = []
+            self.nogood_index = {}
+        if not self.inference_bitmask(masks, self.get_all_bitmask_arcs(),
+                                      self.get_all_bitmask_groups()):
+            return None
+        return masks
+
+    def propagate(self, assumptions: list = None, gac: bool = False):
+        """Decide the 'assumptions' and propagate them with the bitmask
+        engine, without searching.
+
+        Parameters
+        ----------
+        assumptions : list
+            (variable, value) pairs to decide
+        gac : bool
+            Propagate the Alldiff constraints as global constraints
+
+        Returns
+        -------
+        dict | None
+            The remaining domains, in the format of backtracking_search,
+            or None if propagation shows that there is no solution
+        """
+        self.configure_search(True, False, gac, None, False, False,
+                              None, None, assumptions)
+        masks = self.root_masks(assumptions)
+        if masks is None:
+            return None
+        return {var: self.mask_to_values(mask)
+                for var, mask in zip(self.variables, masks)}
+
+    def restart_search(self, masks: list, policy: str, base: int):
+        """Run the bitmask engine in runs with a growing cutoff on the
+        number of backtracks, until a run finds a solution or proves
+        that there is none.
+
+        Parameters
+        ----------
+        masks : list
+            The partial assignment after the root propagation
+        policy : str
+            One of `RESTART_POLICIES`
+        base : int
+            Number of backtracks the policy is scaled by
+
+        Returns
+        -------
+        list | None
+            The masks of a complete assignment, or None if there is no
+            solution
+        """
+        cutoff = self.RESTART_POLICIES[policy]
+        root = len(self.trail)
+        run = 1
+        while True:
+            self.backtrack_limit = self.backtracks + base * cutoff(run)
+            try:
+                if self.learning:
+                    return self.backtrack_learning(masks)
+                return self.backtrack_bitmask(masks)
+            except RestartSearch:
+                self.restarts = self.restarts + 1
+                self.undo_bitmask(masks, root)
+                self.decisions = []
+                self.depth = 0
+                run += 1
+                if self.trace is not None:
+                    self.trace('restart', run=run)
+
     # Edited method, see internal comments inside the method definition
     def backtrack(self, assignment):
         """The function 'Backtrack' from the pseudocode in the
@@ -194,6 +1138,8 @@ class CSP:
             if not len(variable) == 1:
                 finished = False
         if finished:
+            if self.trace is not None:
+                self.trace('solution', depth=self.depth)
             return assignment
 
         # For every time we go through the backtracking method, we add one to the backtracks
@@ -206,19 +1152,79 @@ class CSP:
         for value in assignment[variable]:
             # Here we make a deepcopy of the assignment and assign the current variable the current value
             assCopy = copy.deepcopy(assignment)
-            assCopy[variable] = value
+            assCopy[variable] = [value]
+            self.enter_decision(variable, value)
             # AC-3
             # Here we call the inference method on the copy of the assignment,
             # And then we recursively backtrack if the inference method returns true
-            inferences = self.inference(assCopy, self.get_all_arcs())
+            inferences = self.inference(assCopy,
+                                        self.get_decision_arcs(variable))
             if inferences:
                 result = self.backtrack(assCopy)
                 # If this yields a result, then we return this result,
                 # if not, then we increase the counter for every failed back track and return nothing
                 if result:
                     return result
-        self.failed = self.failed + 1
+            self.depth = self.depth - 1
+        self.leave_node(variable)
+        return None
+
+    def backtrack_trail(self, assignment):
+        """Same search as `backtrack`, but on a single 'assignment'.
+
+        Instead of deep-copying 'assignment' for every value, the
+        domain that is replaced by the decision and every value that
+        AC-3 removes afterwards are recorded on `self.trail`. When a
+        branch fails, the trail is rolled back to where it was before
+        the branch, so the work per branch scales with the number of
+        pruned values and not with the number of variables.
+        """
+        finished = True
+        for key, variable in assignment.items():
+            if not len(variable) == 1:
+                finished = False
+        if finished:
+            if self.trace is not None:
+                self.trace('solution', depth=self.depth)
+            return assignment
+
+        self.backtracks = self.backtracks + 1
+
+        variable = self.select_unassigned_random_variable(assignment)
+        # The decision replaces the list in 'assignment' and AC-3 never
+        # touches the replaced list, so it is safe to iterate over it
+        for value in assignment[variable]:
+            mark = len(self.trail)
+            self.trail.append((variable, None, assignment[variable]))
+            assignment[variable] = [value]
+            self.enter_decision(variable, value)
+            if self.inference(assignment, self.get_decision_arcs(variable)):
+                result = self.backtrack_trail(assignment)
+                if result:
+                    return result
+            self.undo_trail(assignment, mark)
+            self.depth = self.depth - 1
+        self.leave_node(variable)
         return None
+
+    def undo_trail(self, assignment, mark: int):
+        """Roll 'assignment' back to the state it had when the trail
+        was `mark` entries long.
+
+        Parameters
+        ----------
+        assignment : dict
+            The partial assignment used by `backtrack_trail`
+        mark : int
+            Length of `self.trail` to go back to
+        """
+        while len(self.trail) > mark:
+            (var, index, value) = self.trail.pop()
+            if index is None:
+                # A decision, 'value' is the replaced domain
+                assignment[var] = value
+            else:
+                assignment[var].insert(index, value)
         
     # Edited method, see internal comments inside the method definition
     def select_unassigned_variable(self, assignment):
@@ -240,11 +1246,10 @@ class CSP:
     
     def select_unassigned_random_variable(self, assignment) : 
 
-        
-        rand1 = random.randint(0, 8)
-        rand2 = random.randint(0, 8)
-
-        var = str(rand1)+"-"+str(rand2)
+        # Pick among the variables that still have more than one legal value,
+        # so that decided variables are never selected again
+        var = random.choice([key for key, domain in assignment.items()
+                             if len(domain) > 1])
 
         #self.domainSum += len(assignment[var])
 
@@ -294,30 +1299,36 @@ class CSP:
         """
 
         ## In this method we check through the queue of the partial assignment "assignment"
-        #  While there still is a queue, we pop from the queue
+        #  While there still is a queue, we pop from the front of the queue
         #  Then we call the revise method, and if that returns true,
-        #  meaning it has removed an illegal value, then we check if the length of the queue is 0
+        #  meaning it has removed an illegal value, then we check if the domain of i is empty
         #  if so, we return false, if not, we continue.
-        #  then we get all the arc's from the neighbours and remove the neighbour if its has the same value
-        #  and finally we insert the neighbours in the queue
+        #  then we get all the arc's from the neighbours, skip the arc coming from j
+        #  and the arcs that already are in the queue, and append the rest to the back of the queue
         #  once this is all done, we return True back to the backtracking algorithm
+        started = time.perf_counter()
+        queue = deque(queue)
+        in_queue = set(queue)
+        self.enqueued += len(queue)
         while queue:
 
-            (i, j) = queue.pop()          
+            arc = queue.popleft()
+            in_queue.discard(arc)
+            (i, j) = arc
 
+            self.revisions += 1
             if self.revise(assignment, i, j): 
                 if len(assignment.get(i)) == 0 : 
+                    self.propagation_seconds += time.perf_counter() - started
                     return False
-                
-                neighbors = self.get_all_neighboring_arcs(i) 
 
-                for neighbor in neighbors : 
-                    if neighbor[0] == j: 
-                       neighbors.remove(neighbor)
-                
-                for neighbor in neighbors:
-                    queue.insert(0, neighbor)
+                for neighbor in self.get_all_neighboring_arcs(i):
+                    if neighbor[0] != j and neighbor not in in_queue:
+                        in_queue.add(neighbor)
+                        queue.append(neighbor)
+                        self.enqueued += 1
 
+        self.propagation_seconds += time.perf_counter() - started
         return True
 
         
@@ -338,12 +1349,807 @@ class CSP:
         ## Then we go through the partial assignment "assignment"
         #  And we remove any of the assignments that don't fit the constraint between
         #  j and i from i. If we have removed a value, then revised will be true and we return revised.
-        if len(assignment.get(j)) == 1: 
-            if assignment.get(j)[0] in assignment.get(i): 
-                assignment.get(i).remove(assignment.get(j)[0])
+        #  An Alldiff can only remove the value of j once j has been decided,
+        #  any other constraint is checked against every value left for j
+        constraint = self.constraints[i][j]
+        if isinstance(constraint, AllDifferentConstraint):
+            if len(assignment.get(j)) == 1: 
+                if assignment.get(j)[0] in assignment.get(i): 
+                    self.remove_value(assignment, i, assignment.get(j)[0])
+                    revised = True
+            return revised
+
+        # A value keeps its support as long as the residue, the support
+        # found last time, is still in the domain of j
+        residues = self.residues
+        domain_j = assignment.get(j)
+        for value in list(assignment.get(i)):
+            key = (i, j, value)
+            if key in residues and residues[key] in domain_j:
+                continue
+            for other in domain_j:
+                if constraint.allows(value, other):
+                    residues[key] = other
+                    break
+            else:
+                self.remove_value(assignment, i, value)
                 revised = True
         return revised
 
+    def remove_value(self, assignment, var: str, value):
+        """Remove 'value' from the domain of 'var' in 'assignment',
+        and record the removal if the search runs with a trail.
+
+        Parameters
+        ----------
+        assignment : dict
+            The partial assignment
+        var : str
+            Name of the variable
+        value
+            The value to remove
+        """
+        domain = assignment[var]
+        index = domain.index(value)
+        del domain[index]
+        self.pruned += 1
+        if self.trail is not None:
+            self.trail.append((var, index, value))
+
+    def backtrack_bitmask(self, masks: list):
+        """Bitmask version of `backtrack`.
+
+        'masks' holds one domain bitmask per variable, indexed like
+        `self.variables`. A variable is decided when its mask has a
+        single bit set. Every value is tried on a flat copy of 'masks',
+        which replaces the deep copy of the dictionary of lists.
+
+        Parameters
+        ----------
+        masks : list
+            The partial assignment as domain bitmasks
+
+        Returns
+        -------
+        list | None
+            The masks of a complete assignment, or None if there is no
+            solution below this partial assignment
+        """
+        variable = self.select_unassigned_variable_bitmask(masks)
+        if variable is None:
+            if self.trace is not None:
+                self.trace('solution', depth=self.depth)
+            return masks
+
+        self.backtracks = self.backtracks + 1
+        if self.backtracks > self.backtrack_limit:
+            raise RestartSearch()
+
+        name = self.variables[variable]
+        for bit in self.order_values_bitmask(masks, variable):
+            if self.trail is None:
+                masks_copy = masks[:]
+                masks_copy[variable] = bit
+            else:
+                mark = len(self.trail)
+                masks_copy = masks
+                self.set_mask(masks, variable, bit)
+            self.enter_decision(name, self.bit_values[bit.bit_length() - 1])
+            if self.inference_bitmask(masks_copy,
+                                      self.get_decision_bitmask_arcs(variable),
+                                      self.get_decision_groups(variable)):
+                result = self.backtrack_bitmask(masks_copy)
+                if result:
+                    return result
+            if self.trail is not None:
+                self.undo_bitmask(masks, mark)
+            self.depth = self.depth - 1
+        self.leave_node(name)
+        return None
+
+    def backtrack_learning(self, masks: list):
+        """Version of `backtrack_bitmask` with conflict-directed
+        backjumping and nogood recording.
+
+        Decision level 'd' is the 'd'-th decision on `self.decisions`,
+        and a set of levels is an int with bit 'd' set for level 'd'.
+        Every value that is removed gets an explanation in
+        `self.bit_explanations`: the levels whose decisions caused the
+        removal. When a value fails, its conflict is the set of levels
+        that caused the failure. If the conflict does not contain the
+        current level, the other values would fail for the same reason,
+        so the search jumps back without trying them. Otherwise the
+        conflicts of all values, minus the current level, together with
+        the explanations of the values removed before this node, form
+        the conflict of the node. The decisions at those levels are
+        recorded as a nogood, so they are never combined again.
+
+        Parameters
+        ----------
+        masks : list
+            The partial assignment as domain bitmasks
+
+        Returns
+        -------
+        list | None
+            The masks of a complete assignment, or None with the
+            conflict in `self.conflict`
+        """
+        variable = self.select_unassigned_variable_bitmask(masks)
+        if variable is None:
+            if self.trace is not None:
+                self.trace('solution', depth=self.depth)
+            return masks
+
+        self.backtracks = self.backtracks + 1
+        if self.backtracks > self.backtrack_limit:
+            raise RestartSearch()
+
+        name = self.variables[variable]
+        level = len(self.decisions) + 1
+        level_bit = 1 << level
+        domain = masks[variable]
+        conflict = self.explain_removed(variable,
+                                        self.bit_domains[variable] & ~domain)
+        explanations = self.bit_explanations[variable]
+
+        for bit in self.order_values_bitmask(masks, variable):
+            value_conflict = self.check_nogoods(masks, variable, bit)
+            if value_conflict is None:
+                mark = len(self.trail)
+                self.decisions.append((variable, bit))
+                rest = domain & ~bit
+                while rest:
+                    other = rest & -rest
+                    explanations[other.bit_length() - 1] = level_bit
+                    rest ^= other
+                self.set_mask(masks, variable, bit)
+                self.enter_decision(name,
+                                    self.bit_values[bit.bit_length() - 1])
+                if self.inference_bitmask(
+                        masks, self.get_decision_bitmask_arcs(variable),
+                        self.get_decision_groups(variable)):
+                    result = self.backtrack_learning(masks)
+                    if result:
+                        return result
+                value_conflict = self.conflict
+                self.decisions.pop()
+                self.undo_bitmask(masks, mark)
+                self.depth = self.depth - 1
+            else:
+                value_conflict |= level_bit
+
+            if not value_conflict & level_bit:
+                self.backjumps = self.backjumps + 1
+                self.leave_node(name)
+                self.conflict = value_conflict
+                return None
+            conflict |= value_conflict & ~level_bit
+
+        self.leave_node(name)
+        self.record_nogood(conflict)
+        self.conflict = conflict
+        return None
+
+    def explain_removed(self, var: int, removed: int) -> int:
+        """Return the set of decision levels that explains why the
+        values in 'removed' are no longer in the domain of 'var'.
+
+        Parameters
+        ----------
+        var : int
+            Index of the variable
+        removed : int
+            Mask of removed values of the variable
+
+        Returns
+        -------
+        int
+            The union of the explanations of the values, as levels
+        """
+        explanations = self.bit_explanations[var]
+        levels = 0
+        while removed:
+            bit = removed & -removed
+            levels |= explanations[bit.bit_length() - 1]
+            removed ^= bit
+        return levels
+
+    def record_nogood(self, conflict: int):
+        """Record the decisions at the levels in 'conflict' as a
+        nogood, a combination of decisions that has no solution.
+
+        Parameters
+        ----------
+        conflict : int
+            Set of decision levels
+        """
+        if len(self.nogoods) >= self.max_nogoods:
+            return
+        nogood = []
+        level = 1
+        conflict >>= 1
+        while conflict:
+            if conflict & 1:
+                nogood.append(self.decisions[level - 1])
+            conflict >>= 1
+            level += 1
+        nogood = tuple(nogood)
+        self.nogoods.append(nogood)
+        for literal in nogood:
+            self.nogood_index.setdefault(literal, []).append(nogood)
+
+    def check_nogoods(self, masks: list, var: int, bit: int):
+        """Check whether deciding 'var' to the value 'bit' would
+        complete a recorded nogood.
+
+        Parameters
+        ----------
+        masks : list
+            The partial assignment as domain bitmasks
+        var : int
+            Index of the variable
+        bit : int
+            The value, as a single-bit mask
+
+        Returns
+        -------
+        int | None
+            The levels explaining why the rest of the nogood holds, or
+            None if no nogood is completed by the decision
+        """
+        for nogood in self.nogood_index.get((var, bit), ()):
+            for (other, other_bit) in nogood:
+                if other != var and masks[other] != other_bit:
+                    break
+            else:
+                levels = 0
+                for (other, other_bit) in nogood:
+                    if other != var:
+                        levels |= self.explain_removed(
+                            other, self.bit_domains[other] & ~other_bit)
+                return levels
+        return None
+
+    def order_values_bitmask(self, masks: list, var: int) -> list:
+        """Return the values of 'var' in the order they should be
+        tried, as single-bit masks.
+
+        With `self.lcv`, the values are sorted on how many values they
+        would remove from the domains of the neighbours, counted from
+        the support masks, with the least constraining value first.
+        With `self.random`, ties are broken at random.
+
+        Parameters
+        ----------
+        masks : list
+            The partial assignment as domain bitmasks
+        var : int
+            Index of the variable
+
+        Returns
+        -------
+        list
+            The values in the domain of 'var'
+        """
+        values = []
+        rest = masks[var]
+        while rest:
+            bit = rest & -rest
+            values.append(bit)
+            rest ^= bit
+        if self.random is not None:
+            self.random.shuffle(values)
+        if not self.lcv or len(values) < 2:
+            return values
+
+        removed = {}
+        for bit in values:
+            position = bit.bit_length() - 1
+            count = 0
+            for j, supports in self.bit_supports[var].items():
+                if supports is None:
+                    if masks[j] & bit:
+                        count += 1
+                else:
+                    count += (masks[j] & ~supports[position]).bit_count()
+            removed[bit] = count
+        values.sort(key=removed.__getitem__)
+        return values
+
+    def undo_bitmask(self, masks: list, mark: int):
+        """Bitmask version of `undo_trail`, where every trail entry is
+        a variable index and the mask it had before it was reduced.
+
+        Parameters
+        ----------
+        masks : list
+            The partial assignment as domain bitmasks
+        mark : int
+            Length of `self.trail` to go back to
+        """
+        while len(self.trail) > mark:
+            (var, mask) = self.trail.pop()
+            if self.buckets is not None:
+                self.move_to_bucket(var, masks[var], mask)
+            masks[var] = mask
+
+    def set_mask(self, masks: list, var: int, mask: int):
+        """Replace the domain of 'var' in 'masks' by 'mask', recording
+        the old domain on the trail and moving the variable to the
+        bucket of its new domain size.
+
+        Parameters
+        ----------
+        masks : list
+            The partial assignment as domain bitmasks
+        var : int
+            Index of the variable
+        mask : int
+            The new domain of the variable
+        """
+        old = masks[var]
+        if self.trail is not None:
+            self.trail.append((var, old))
+        if self.buckets is not None:
+            self.move_to_bucket(var, old, mask)
+        masks[var] = mask
+
+    def fill_buckets(self, masks: list):
+        """Put every undecided variable in the bucket of its domain
+        size, and start the failure weights of mrv/wdeg from zero.
+
+        Parameters
+        ----------
+        masks : list
+            The partial assignment as domain bitmasks
+        """
+        self.bit_degrees = [len(supports) for supports in self.bit_supports]
+        self.bit_weights = [0] * len(self.variables)
+        if self.ordering == 'degree':
+            self.bucket_scores = self.bit_degrees
+        elif self.ordering == 'mrv/wdeg':
+            self.bucket_scores = self.bit_weights
+        else:
+            self.bucket_scores = None
+        sizes = range(len(self.bit_values) + 1)
+        self.buckets = [set() for size in sizes]
+        self.bucket_heaps = (None if self.bucket_scores is None
+                             else [[] for size in sizes])
+        self.bucket_sizes = 0
+        for var, mask in enumerate(masks):
+            self.move_to_bucket(var, 0, mask)
+
+    def move_to_bucket(self, var: int, old: int, mask: int):
+        """Move 'var' from the bucket of domain 'old' to the bucket of
+        domain 'mask'. Decided variables are kept out of the buckets.
+
+        Parameters
+        ----------
+        var : int
+            Index of the variable
+        old : int
+            The domain the variable had
+        mask : int
+            The domain the variable has now
+        """
+        old_size = old.bit_count()
+        size = mask.bit_count()
+        if old_size == size:
+            return
+        if old_size > 1:
+            bucket = self.buckets[old_size]
+            bucket.discard(var)
+            if not bucket:
+                self.bucket_sizes &= ~(1 << old_size)
+        if size > 1:
+            self.buckets[size].add(var)
+            self.bucket_sizes |= 1 << size
+            if self.bucket_heaps is not None:
+                self.push_to_heap(var, size)
+
+    def push_to_heap(self, var: int, size: int):
+        """Push the current score of 'var' on the heap of bucket
+        'size', which holds the variable. A heap that has grown to more
+        than twice its bucket is rebuilt from the bucket instead.
+
+        Parameters
+        ----------
+        var : int
+            Index of the variable
+        size : int
+            Domain size of the variable
+        """
+        heap = self.bucket_heaps[size]
+        bucket = self.buckets[size]
+        if len(heap) > 2 * len(bucket) + 8:
+            heap[:] = [self.heap_entry(other) for other in bucket]
+            heapq.heapify(heap)
+        else:
+            heapq.heappush(heap, self.heap_entry(var))
+
+    def heap_entry(self, var: int) -> tuple:
+        """Return the bucket heap entry of 'var'. Equal scores go to
+        the lowest index, or in a random order with `self.random`.
+        """
+        tie = var if self.random is None else self.random.random()
+        return (-self.bucket_scores[var], tie, var)
+
+    def bump_weight(self, masks: list, var: int):
+        """Add one to the failure weight of 'var', and push the new
+        weight on the heap of its bucket with the 'mrv/wdeg' ordering.
+
+        Parameters
+        ----------
+        masks : list
+            The partial assignment as domain bitmasks
+        var : int
+            Index of the variable
+        """
+        self.bit_weights[var] += 1
+        size = masks[var].bit_count()
+        if self.ordering == 'mrv/wdeg' and size > 1:
+            self.push_to_heap(var, size)
+
+    def select_unassigned_variable_bitmask(self, masks: list):
+        """Return the index of the undecided variable with the smallest
+        domain, counting the values of a domain with a popcount.
+
+        With a variable ordering, the variable is taken from the lowest
+        non-empty bucket instead, and ties are broken as described in
+        `VARIABLE_ORDERINGS`. Finding the bucket takes O(1), and 'mrv'
+        takes any variable of it. 'degree' and 'mrv/wdeg' take the top of
+        the heap of the bucket, after popping the entries of variables
+        that have left the bucket or whose score has changed since.
+
+        Parameters
+        ----------
+        masks : list
+            The partial assignment as domain bitmasks
+
+        Returns
+        -------
+        int | None
+            Index of the variable, or None if every variable is decided
+        """
+        if self.ordering is not None:
+            if not self.bucket_sizes:
+                return None
+            lowest = self.bucket_sizes & -self.bucket_sizes
+            smallest = lowest.bit_length() - 1
+            bucket = self.buckets[smallest]
+            if self.bucket_heaps is not None:
+                heap = self.bucket_heaps[smallest]
+                scores = self.bucket_scores
+                (score, tie, var) = heap[0]
+                while var not in bucket or -score != scores[var]:
+                    heapq.heappop(heap)
+                    (score, tie, var) = heap[0]
+            elif self.random is not None:
+                var = self.random.choice(tuple(bucket))
+            else:
+                var = next(iter(bucket))
+            self.domainSum += smallest
+            return var
+
+        var = None
+        smallest = 0
+        for k, mask in enumerate(masks):
+            size = mask.bit_count()
+            if size > 1 and (var is None or size < smallest):
+                var = k
+                smallest = size
+                if size == 2:
+                    break
+        if var is not None:
+            self.domainSum += smallest
+        return var
+
+    def inference_bitmask(self, masks: list, queue, groups=()) -> bool:
+        """Bitmask version of `inference` (AC-3).
+
+        With `self.gac` set, the Alldiff groups are propagated as well.
+        The arcs are revised first, and a group is only propagated when
+        the arc queue is empty. Whenever a domain is reduced, the arcs
+        going into the variable and its groups are queued again.
+
+        Parameters
+        ----------
+        masks : list
+            The partial assignment as domain bitmasks, reduced in place
+        queue : iterable
+            Ids of the arcs in `self.bit_arcs` to start with
+        groups : iterable
+            Ids of the groups in `self.bit_groups` to start with
+
+        Returns
+        -------
+        bool
+            False if a domain was wiped out, True otherwise
+        """
+        started = time.perf_counter()
+        arcs = self.bit_arcs
+        neighboring_arcs = self.bit_neighboring_arcs
+        var_groups = self.bit_var_groups
+        gac = self.gac
+        queue = deque(queue)
+        in_queue = bytearray(len(arcs))
+        for arc in queue:
+            in_queue[arc] = 1
+        group_queue = deque(groups)
+        in_group_queue = bytearray(len(self.bit_groups))
+        for group in group_queue:
+            in_group_queue[group] = 1
+        # The counters are kept in locals and added to the statistics
+        # on the way out
+        revisions = 0
+        enqueued = len(queue) + len(group_queue)
+
+        consistent = True
+        while queue or group_queue:
+            revisions += 1
+            if queue:
+                arc = queue.popleft()
+                in_queue[arc] = 0
+                (i, j) = arcs[arc]
+                if not self.revise_bitmask(masks, i, j):
+                    continue
+                if masks[i] == 0:
+                    if self.buckets is not None:
+                        self.bump_weight(masks, i)
+                        self.bump_weight(masks, j)
+                    if self.learning:
+                        self.conflict = self.explain_removed(
+                            i, self.bit_domains[i])
+                    consistent = False
+                    break
+                changed = (i,)
+                group = None
+            else:
+                group = group_queue.popleft()
+                in_group_queue[group] = 0
+                changed = self.propagate_all_different(masks, group)
+                if changed is None:
+                    if self.buckets is not None:
+                        for var in self.bit_groups[group]:
+                            self.bump_weight(masks, var)
+                    if self.learning:
+                        self.conflict = self.explain_group(masks, group)
+                    consistent = False
+                    break
+                j = None
+
+            for i in changed:
+                for (neighbor, k) in neighboring_arcs[i]:
+                    if k != j and not in_queue[neighbor]:
+                        in_queue[neighbor] = 1
+                        queue.append(neighbor)
+                        enqueued += 1
+                if gac:
+                    # Alldiff filtering is idempotent, so the group that
+                    # made the change needs no second visit
+                    for other in var_groups[i]:
+                        if other != group and not in_group_queue[other]:
+                            in_group_queue[other] = 1
+                            group_queue.append(other)
+                            enqueued += 1
+
+        self.revisions += revisions
+        self.enqueued += enqueued
+        self.propagation_seconds += time.perf_counter() - started
+        return consistent
+
+    def propagate_all_different(self, masks: list, group: int):
+        """Make the Alldiff 'group' generalized arc consistent, using
+        the matching-based filtering by Régin.
+
+        A value is kept for a variable if the variable can take it in
+        some maximum matching between the variables and the values of
+        the group. After a maximum matching M has been found, that is
+        the case for the matched value, for values reachable from a
+        free value by an alternating path, and for values on an
+        alternating cycle through the variable. The last ones are found
+        from the transitive closure of the relation "the value matched
+        to x is in the domain of y".
+
+        Parameters
+        ----------
+        masks : list
+            The partial assignment as domain bitmasks, reduced in place
+        group : int
+            Id of the group in `self.bit_groups`
+
+        Returns
+        -------
+        list | None
+            Indices of the variables whose domains were reduced, or None
+            if the variables cannot all take different values
+        """
+        variables = self.bit_groups[group]
+        n = len(variables)
+        domains = [masks[var] for var in variables]
+        union = 0
+        for domain in domains:
+            union |= domain
+        if union.bit_count() < n:
+            return None
+
+        # Maximum matching by augmenting paths, starting from the
+        # matching found the last time, as far as it is still valid
+        matching = self.bit_matchings[group]
+        owner = {}
+        for x in range(n):
+            bit = matching[x]
+            if bit & domains[x] and bit not in owner:
+                owner[bit] = x
+            else:
+                matching[x] = 0
+
+        def augment(x, seen):
+            while True:
+                rest = domains[x] & ~seen[0]
+                if not rest:
+                    return False
+                bit = rest & -rest
+                seen[0] |= bit
+                y = owner.get(bit)
+                if y is None or augment(y, seen):
+                    owner[bit] = x
+                    matching[x] = bit
+                    return True
+
+        for x in range(n):
+            if not matching[x] and not augment(x, [0]):
+                return None
+
+        # Values reachable from a free value by an alternating path
+        reached = union & ~sum(matching)
+        if reached:
+            growing = True
+            while growing:
+                growing = False
+                for x in range(n):
+                    if (not matching[x] & reached
+                            and domains[x] & ~matching[x] & reached):
+                        reached |= matching[x]
+                        growing = True
+
+        # reach[x] is the set of variables y (as a bitmask over the
+        # positions in the group) that x reaches by alternating paths
+        reach = [1 << x for x in range(n)]
+        for x in range(n):
+            for y in range(n):
+                if matching[x] & domains[y]:
+                    reach[x] |= 1 << y
+        for k in range(n):
+            bit = 1 << k
+            reach_k = reach[k]
+            for x in range(n):
+                if reach[x] & bit:
+                    reach[x] |= reach_k
+
+        changed = []
+        explanation = None
+        for x in range(n):
+            allowed = reached
+            rest = reach[x]
+            while rest:
+                bit = rest & -rest
+                allowed |= matching[bit.bit_length() - 1]
+                rest ^= bit
+            kept = domains[x] & allowed
+            if kept != domains[x]:
+                var = variables[x]
+                if self.learning:
+                    if explanation is None:
+                        explanation = self.explain_group(masks, group)
+                    explanations = self.bit_explanations[var]
+                    rest = domains[x] & ~kept
+                    while rest:
+                        bit = rest & -rest
+                        explanations[bit.bit_length() - 1] = explanation
+                        rest ^= bit
+                self.pruned += (domains[x] & ~kept).bit_count()
+                self.set_mask(masks, var, kept)
+                changed.append(var)
+        return changed
+
+    def explain_group(self, masks: list, group: int) -> int:
+        """Return the decision levels that explain the current domains
+        of the variables in the Alldiff 'group'. Régin's filtering only
+        depends on those domains, so this explains every value it
+        removes, and a failure of the group.
+
+        Parameters
+        ----------
+        masks : list
+            The partial assignment as domain bitmasks
+        group : int
+            Id of the group in `self.bit_groups`
+
+        Returns
+        -------
+        int
+            The union of the explanations of all removed values
+        """
+        levels = 0
+        for var in self.bit_groups[group]:
+            levels |= self.explain_removed(var,
+                                           self.bit_domains[var] & ~masks[var])
+        return levels
+
+    def revise_bitmask(self, masks: list, i: int, j: int) -> bool:
+        """Bitmask version of `revise`. A value of `i` is kept if its
+        support mask for the arc (i, j) intersects the domain of `j`.
+
+        Parameters
+        ----------
+        masks : list
+            The partial assignment as domain bitmasks
+        i : int
+            Index of the variable whose domain is revised
+        j : int
+            Index of the other variable of the arc
+
+        Returns
+        -------
+        bool
+            True if the domain of `i` was reduced
+        """
+        supports = self.bit_supports[i][j]
+        domain_j = masks[j]
+        domain_i = masks[i]
+        if supports is None:
+            # x != y only removes the value of a decided 'j'
+            if domain_j & (domain_j - 1):
+                return False
+            kept = domain_i & ~domain_j if domain_j else 0
+        else:
+            kept = 0
+            rest = domain_i
+            while rest:
+                bit = rest & -rest
+                if supports[bit.bit_length() - 1] & domain_j:
+                    kept |= bit
+                rest ^= bit
+        if kept != domain_i:
+            if self.learning:
+                self.explain_revision(i, j, domain_i & ~kept)
+            self.pruned += (domain_i & ~kept).bit_count()
+            self.set_mask(masks, i, kept)
+            return True
+        return False
+
+
+    def explain_revision(self, i: int, j: int, removed: int):
+        """Store the explanations of the values in 'removed', which
+        revise_bitmask is about to remove from 'i' because they have no
+        support left in 'j'. A value of 'i' loses its support when all
+        of its supporting values of 'j' have been removed, so it is
+        explained by the union of their explanations.
+
+        Parameters
+        ----------
+        i : int
+            Index of the revised variable
+        j : int
+            Index of the other variable of the arc
+        removed : int
+            Mask of the values that are removed from 'i'
+        """
+        supports = self.bit_supports[i][j]
+        initial_j = self.bit_domains[j]
+        explanations = self.bit_explanations[i]
+        while removed:
+            bit = removed & -removed
+            position = bit.bit_length() - 1
+            if supports is None:
+                supporting = initial_j & ~bit
+            else:
+                supporting = supports[position] & initial_j
+            explanations[position] = self.explain_removed(j, supporting)
+            removed ^= bit
+
 
 def create_map_coloring_csp():
     """Instantiate a CSP representing the map coloring problem from the
@@ -364,10 +2170,129 @@ def create_map_coloring_csp():
     return csp
 
 
+def create_grid_csp(board: list, values: list, units: list) -> CSP:
+    """Instantiate a CSP for a grid puzzle, where every cell takes one
+    of 'values' and the cells of every unit must all be different. The
+    variable of the cell in row 'r' and column 'c' is named 'r-c'.
+
+    Parameters
+    ----------
+    board : list
+        The rows of the grid, as lists of cells. A cell is '0' or '.'
+        when it is empty, and its given value otherwise
+    values : list
+        The legal values of an empty cell
+    units : list
+        Lists of (row, col) cells that form an Alldiff
+
+    Returns
+    -------
+    CSP
+        A CSP instance
+    """
+    csp = CSP()
+
+    for row, cells in enumerate(board):
+        for col, cell in enumerate(cells):
+            if cell in ('0', '.'):
+                csp.add_variable('%d-%d' % (row, col), values)
+            elif cell in values:
+                csp.add_variable('%d-%d' % (row, col), [cell])
+            else:
+                raise ValueError('illegal value %r in row %d, column %d'
+                                 % (cell, row, col))
+
+    for unit in units:
+        csp.add_all_different_constraint(['%d-%d' % (row, col)
+                                          for (row, col) in unit])
+
+    return csp
+
+
+def sudoku_box_shape(size: int) -> tuple:
+    """Return the shape (rows, columns) of the boxes of a Sudoku with
+    'size' rows, which is as close to a square as possible: 3x3 for
+    9x9, 4x4 for 16x16, 5x5 for 25x25 and 2x3 for 6x6.
+
+    Parameters
+    ----------
+    size : int
+        Number of rows (and columns and values) of the Sudoku
+
+    Returns
+    -------
+    tuple
+        (box_rows, box_cols)
+    """
+    box_rows = int(size ** 0.5)
+    while size % box_rows:
+        box_rows -= 1
+    return box_rows, size // box_rows
+
+
+def sudoku_units(size: int, box_rows: int, box_cols: int) -> list:
+    """Return the rows, columns and boxes of a Sudoku as lists of
+    (row, col) cells.
+
+    Parameters
+    ----------
+    size : int
+        Number of rows (and columns and values) of the Sudoku
+    box_rows : int
+        Number of rows in a box
+    box_cols : int
+        Number of columns in a box
+
+    Returns
+    -------
+    list
+        The units of the Sudoku
+    """
+    units = []
+    for row in range(size):
+        units.append([(row, col) for col in range(size)])
+    for col in range(size):
+        units.append([(row, col) for row in range(size)])
+    for box_row in range(0, size, box_rows):
+        for box_col in range(0, size, box_cols):
+            units.append([(row, col)
+                          for row in range(box_row, box_row + box_rows)
+                          for col in range(box_col, box_col + box_cols)])
+    return units
+
+
+def parse_sudoku_row(line: str) -> list:
+    """Split a row of a Sudoku board into its cells. A row is either a
+    string with one character per cell, like '004030050', or cells
+    separated by whitespace or commas, like '0 12 0 3 ...', which is
+    needed for boards with values above 9.
+
+    Parameters
+    ----------
+    line : str
+        A row of the board
+
+    Returns
+    -------
+    list
+        The cells of the row, with empty cells as '0'
+    """
+    line = line.strip()
+    if any(separator in line for separator in ' \t,'):
+        cells = line.replace(',', ' ').split()
+    else:
+        cells = list(line)
+    return ['0' if cell == '.' else str(int(cell)) for cell in cells]
+
+
 def create_sudoku_csp(filename: str) -> CSP:
     """Instantiate a CSP representing the Sudoku board found in the text
     file named 'filename' in the current directory.
 
+    The file has one line per row (see parse_sudoku_row), so both the
+    9x9 boards like easy.txt and larger boards like 16x16 or 25x25 can
+    be read. Empty lines are skipped.
+
     Parameters
     ----------
     filename : str
@@ -378,47 +2303,83 @@ def create_sudoku_csp(filename: str) -> CSP:
     CSP
         A CSP instance
     """
-    csp = CSP()
-    board = list(map(lambda x: x.strip(), open(filename, 'r')))
+    board = [line for line in map(lambda x: x.strip(), open(filename, 'r'))
+             if line]
+    return create_sudoku_csp_from_board(board)
 
-    for row in range(9):
-        for col in range(9):
-            if board[row][col] == '0':
-                csp.add_variable('%d-%d' % (row, col), list(map(str,
-                                                                range(1, 10))))
-            else:
-                csp.add_variable('%d-%d' % (row, col), [board[row][col]])
 
-    for row in range(9):
-        csp.add_all_different_constraint(['%d-%d' % (row, col)
-                                          for col in range(9)])
-    for col in range(9):
-        csp.add_all_different_constraint(['%d-%d' % (row, col)
-                                         for row in range(9)])
-    for box_row in range(3):
-        for box_col in range(3):
-            cells = []
-            for row in range(box_row * 3, (box_row + 1) * 3):
-                for col in range(box_col * 3, (box_col + 1) * 3):
-                    cells.append('%d-%d' % (row, col))
-            csp.add_all_different_constraint(cells)
+def create_sudoku_csp_from_board(board: list) -> CSP:
+    """Instantiate a CSP representing a Sudoku board of any size N×N,
+    where N has boxes of the shape given by sudoku_box_shape, and the
+    values are the strings '1' to 'N'.
 
-    return csp
+    Parameters
+    ----------
+    board : list
+        The rows of the Sudoku board, as strings (see parse_sudoku_row)
+        or as lists of cells
+
+    Returns
+    -------
+    CSP
+        A CSP instance
+    """
+    board = [parse_sudoku_row(row) if isinstance(row, str) else list(row)
+             for row in board]
+    size = len(board)
+    if any(len(row) != size for row in board):
+        raise ValueError('a Sudoku board must have as many columns as rows')
+
+    (box_rows, box_cols) = sudoku_box_shape(size)
+    return create_grid_csp(board, [str(value) for value in range(1, size + 1)],
+                           sudoku_units(size, box_rows, box_cols))
+
+
+def create_latin_square_csp(size: int, board: list = None) -> CSP:
+    """Instantiate a CSP for a Latin square: a grid where every row and
+    every column holds the values '1' to 'size' exactly once.
+
+    Parameters
+    ----------
+    size : int
+        Number of rows (and columns and values)
+    board : list
+        Optional rows of given cells (see parse_sudoku_row), an empty
+        grid by default
+
+    Returns
+    -------
+    CSP
+        A CSP instance
+    """
+    if board is None:
+        board = [['0'] * size for row in range(size)]
+    board = [parse_sudoku_row(row) if isinstance(row, str) else list(row)
+             for row in board]
+    units = sudoku_units(size, size, size)[:2 * size]
+    return create_grid_csp(board, [str(value) for value in range(1, size + 1)],
+                           units)
 
 
 def print_sudoku_solution(solution):
     """Convert the representation of a Sudoku solution as returned from
     the method CSP.backtracking_search(), into a human readable
-    representation.
+    representation. Works for every board size of
+    create_sudoku_csp_from_board.
     """
-    for row in range(9):
-        for col in range(9):
-            print(solution['%d-%d' % (row, col)][0], end=" "),
-            if col == 2 or col == 5:
+    size = int(round(len(solution) ** 0.5))
+    (box_rows, box_cols) = sudoku_box_shape(size)
+    width = len(str(size))
+    separator = '+'.join(['-' * ((width + 1) * box_cols + 1)]
+                         * (size // box_cols))[1:-1]
+    for row in range(size):
+        for col in range(size):
+            print(solution['%d-%d' % (row, col)][0].rjust(width), end=" "),
+            if col % box_cols == box_cols - 1 and col != size - 1:
                 print('|', end=" "),
         print("")
-        if row == 2 or row == 5:
-            print('------+-------+------')
+        if row % box_rows == box_rows - 1 and row != size - 1:
+            print(separator)
 
 
 
@@ -432,45 +2393,46 @@ sol = sudoku.backtracking_search()
 print_sudoku_solution(sol)  """
 
 
-# Solving and printing the different sudoku boards
-print("\n----------------------------------------------------------------")
-print("Easy board: ")
-sudokuEasy = create_sudoku_csp("csp_code_handout/easy.txt")
-sol1 = sudokuEasy.backtracking_search()
-print_sudoku_solution(sol1) 
-print("number of failed atempts: ", sudokuEasy.failed)
-print("number of backtracks: ", sudokuEasy.backtracks)
-print("----------------------------------------------------------------\n")
-
-print("\n----------------------------------------------------------------")
-print("Medium board: ")
-sudokuMed = create_sudoku_csp("csp_code_handout/medium.txt")
-sol2 = sudokuMed.backtracking_search()
-print_sudoku_solution(sol2) 
-print("number of failed atempts: ", sudokuMed.failed)
-print("number of backtracks: ", sudokuMed.backtracks)
-print("sum of domain sizes: ", sudokuMed.domainSum)
-print("----------------------------------------------------------------\n")
-
-print("\n----------------------------------------------------------------")
-print("Hard board: ")
-sudokuHard = create_sudoku_csp("csp_code_handout/hard.txt")
-sol3 = sudokuHard.backtracking_search()
-print_sudoku_solution(sol3) 
-print("number of failed atempts: ", sudokuHard.failed)
-print("number of backtracks: ", sudokuHard.backtracks)
-print("number of domain sizes: ", sudokuHard.domainSum)
-print("----------------------------------------------------------------\n")
-
-print("\n----------------------------------------------------------------")
-print("Very hard board: ")
-sudokuVeryHard = create_sudoku_csp("csp_code_handout/veryhard.txt")
-sol4 = sudokuVeryHard.backtracking_search()
-print_sudoku_solution(sol4) 
-print("number of failed atempts: ", sudokuVeryHard.failed)
-print("number of backtracks: ", sudokuVeryHard.backtracks)
-print("sum of domain sizes: ", sudokuVeryHard.domainSum)
-print("----------------------------------------------------------------\n")
+if __name__ == "__main__":
+    # Solving and printing the different sudoku boards
+    print("\n----------------------------------------------------------------")
+    print("Easy board: ")
+    sudokuEasy = create_sudoku_csp("csp_code_handout/easy.txt")
+    sol1 = sudokuEasy.backtracking_search()
+    print_sudoku_solution(sol1) 
+    print("number of failed atempts: ", sudokuEasy.failed)
+    print("number of backtracks: ", sudokuEasy.backtracks)
+    print("----------------------------------------------------------------\n")
+
+    print("\n----------------------------------------------------------------")
+    print("Medium board: ")
+    sudokuMed = create_sudoku_csp("csp_code_handout/medium.txt")
+    sol2 = sudokuMed.backtracking_search()
+    print_sudoku_solution(sol2) 
+    print("number of failed atempts: ", sudokuMed.failed)
+    print("number of backtracks: ", sudokuMed.backtracks)
+    print("sum of domain sizes: ", sudokuMed.domainSum)
+    print("----------------------------------------------------------------\n")
+
+    print("\n----------------------------------------------------------------")
+    print("Hard board: ")
+    sudokuHard = create_sudoku_csp("csp_code_handout/hard.txt")
+    sol3 = sudokuHard.backtracking_search()
+    print_sudoku_solution(sol3) 
+    print("number of failed atempts: ", sudokuHard.failed)
+    print("number of backtracks: ", sudokuHard.backtracks)
+    print("number of domain sizes: ", sudokuHard.domainSum)
+    print("----------------------------------------------------------------\n")
+
+    print("\n----------------------------------------------------------------")
+    print("Very hard board: ")
+    sudokuVeryHard = create_sudoku_csp("csp_code_handout/veryhard.txt")
+    sol4 = sudokuVeryHard.backtracking_search()
+    print_sudoku_solution(sol4) 
+    print("number of failed atempts: ", sudokuVeryHard.failed)
+    print("number of backtracks: ", sudokuVeryHard.backtracks)
+    print("sum of domain sizes: ", sudokuVeryHard.domainSum)
+    print("----------------------------------------------------------------\n")
 
 
 # medEnd = time.time()
@@ -0,0 +1,240 @@
+# Batch Sudoku solving
+#
+# Solves every puzzle in a file, or in all files of a directory, with
+# the bitmask engine of the CSP class, spread over a process pool, and
+# writes one JSON object per puzzle (solution and search statistics).
+#
+# A puzzle of any size N×N supported by create_sudoku_csp_from_board is
+# either a single line of all N×N cells, for N the square of a box side
+# of 3 and above (9, 16, 25...), or a block of N lines of N cells like
+# easy.txt, where N is the number of cells of the first line. The cells of a line are written as by parse_sudoku_row:
+# one character each, or separated by whitespace or commas, which boards
+# with values above 9 need. Empty cells are '0' or '.', and empty lines
+# and lines starting with '#' are skipped.
+#
+# Example:
+#   python csp_code_handout/batch.py puzzles.txt -o solutions.jsonl -j 8
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+from Assignment import create_sudoku_csp_from_board, parse_sudoku_row
+
+
+# Options given to CSP.backtracking_search for every puzzle
+SOLVER_OPTIONS = dict(bitmask=True, trail=True, gac=True, ordering='mrv')
+
+# Fewest cells of a puzzle given on a single line, so that shorter lines
+# are read as the first row of a block
+MIN_LINE_CELLS = 81
+
+
+def line_puzzle_size(cells: list) -> int:
+    """Return N if 'cells' are all cells of an N×N puzzle given on a
+    single line, that is if there are at least MIN_LINE_CELLS of them and
+    their number is the square of a square, else 0."""
+    size = math.isqrt(len(cells))
+    box = math.isqrt(size)
+    if (len(cells) >= MIN_LINE_CELLS and size * size == len(cells)
+            and box * box == size):
+        return size
+    return 0
+
+
+def format_cells(cells: list) -> str:
+    """Join cells into one string, separated by spaces unless every cell
+    is a single character."""
+    if all(len(cell) == 1 for cell in cells):
+        return ''.join(cells)
+    return ' '.join(cells)
+
+
+def read_puzzles(path: str):
+    """Stream the puzzles found in the file or directory 'path'.
+
+    Parameters
+    ----------
+    path : str
+        A puzzle file, or a directory whose files (in sorted order) are
+        all puzzle files
+
+    Yields
+    ------
+    tuple
+        (source, board), where 'source' is 'file:line' of the first line
+        of the puzzle and 'board' is a list of N rows of N cells
+    """
+    if os.path.isdir(path):
+        filenames = [os.path.join(path, name)
+                     for name in sorted(os.listdir(path))]
+        filenames = [name for name in filenames if os.path.isfile(name)]
+    else:
+        filenames = [path]
+
+    for filename in filenames:
+        block = []
+        first = 0
+        with open(filename, 'r') as file:
+            for number, line in enumerate(file, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                try:
+                    cells = parse_sudoku_row(line)
+                except ValueError:
+                    raise ValueError('%s:%d: not a Sudoku row or puzzle'
+                                     % (filename, number))
+                size = 0 if block else line_puzzle_size(cells)
+                if size:
+                    yield ('%s:%d' % (filename, number),
+                           [cells[row * size:(row + 1) * size]
+                            for row in range(size)])
+                    continue
+                if block and len(cells) != len(block[0]):
+                    raise ValueError('%s:%d: row of %d cells in a puzzle of '
+                                     '%d columns' % (filename, number,
+                                                     len(cells),
+                                                     len(block[0])))
+                if not block:
+                    first = number
+                block.append(cells)
+                if len(block) == len(block[0]):
+                    yield '%s:%d' % (filename, first), block
+                    block = []
+        if block:
+            raise ValueError('%s:%d: incomplete puzzle' % (filename, first))
+
+
+def solve_puzzle(item: tuple) -> dict:
+    """Solve one puzzle from `read_puzzles`.
+
+    Parameters
+    ----------
+    item : tuple
+        (source, board) as yielded by `read_puzzles`
+
+    Returns
+    -------
+    dict
+        The puzzle and its solution as strings of their cells row by row
+        (see format_cells; the solution is None if there is none) and
+        the search statistics
+    """
+    (source, board) = item
+    started = time.perf_counter()
+    csp = create_sudoku_csp_from_board(board)
+    solution = csp.backtracking_search(**SOLVER_OPTIONS)
+    seconds = time.perf_counter() - started
+
+    size = len(board)
+    if solution is not None:
+        solution = format_cells([solution['%d-%d' % (row, col)][0]
+                                 for row in range(size)
+                                 for col in range(size)])
+    return {'source': source,
+            'puzzle': format_cells([cell for row in board for cell in row]),
+            'solution': solution,
+            'backtracks': csp.backtracks,
+            'failed': csp.failed,
+            'seconds': round(seconds, 6)}
+
+
+def solve_batch(path: str, output, workers: int = None,
+                chunksize: int = 64) -> int:
+    """Solve all puzzles in 'path' and write the results to 'output' as
+    JSON lines, in the order the puzzles were read.
+
+    The puzzles are streamed to the pool, which reads a puzzle only once
+    fewer than `chunksize * workers * 4` are waiting to be solved or to
+    be written, so that an arbitrarily large input is never held in
+    memory at once.
+
+    Parameters
+    ----------
+    path : str
+        Puzzle file or directory
+    output : file
+        Text stream the JSON lines are written to
+    workers : int
+        Number of worker processes, all cores if None. With 1, the
+        puzzles are solved in this process.
+    chunksize : int
+        Number of puzzles sent to a worker at a time
+
+    Returns
+    -------
+    int
+        Number of puzzles solved
+    """
+    puzzles = read_puzzles(path)
+    count = 0
+
+    if workers == 1:
+        for item in puzzles:
+            output.write(json.dumps(solve_puzzle(item)) + '\n')
+            count += 1
+        return count
+
+    workers = workers or os.cpu_count() or 1
+    # The pool reads the puzzles in a thread of its own, which takes a
+    # slot for every puzzle; a slot is given back once its result is
+    # written
+    slots = threading.Semaphore(chunksize * workers * 4)
+    stopped = threading.Event()
+
+    def throttled():
+        for item in puzzles:
+            slots.acquire()
+            if stopped.is_set():
+                return
+            yield item
+
+    with multiprocessing.Pool(workers) as pool:
+        try:
+            for result in pool.imap(solve_puzzle, throttled(), chunksize):
+                slots.release()
+                output.write(json.dumps(result) + '\n')
+                count += 1
+        finally:
+            # Wake the reading thread if it waits for a slot, so that
+            # the pool can be shut down
+            stopped.set()
+            slots.release()
+    return count
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(
+        description='Solve a batch of Sudoku puzzles with the CSP solver.')
+    parser.add_argument('path', help='puzzle file or directory of files')
+    parser.add_argument('-o', '--output', default='-',
+                        help='JSON lines output file (default: stdout)')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='number of worker processes (default: all '
+                             'cores)')
+    parser.add_argument('--chunksize', type=int, default=64,
+                        help='puzzles sent to a worker at a time')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    if args.output == '-':
+        count = solve_batch(args.path, sys.stdout, args.workers,
+                            args.chunksize)
+    else:
+        with open(args.output, 'w') as output:
+            count = solve_batch(args.path, output, args.workers,
+                                args.chunksize)
+    seconds = time.perf_counter() - started
+    print('%d puzzles in %.2f s (%.0f puzzles/s)'
+          % (count, seconds, count / seconds if seconds else 0),
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+# CSP benchmark
+#
+# Runs the map colouring CSP, the four bundled Sudoku boards and a
+# generated corpus of hard Sudoku puzzles through every configuration of
+# the solver, several times each, and writes one JSON object per
+# (instance, configuration) with the median and 95th percentile of the
+# solve time, the peak memory and the number of search nodes.
+#
+# The corpus is generated from a seed, so two runs with the same options
+# benchmark the same puzzles. A candidate puzzle is a random solved grid
+# from which clues are removed in random order as long as the puzzle
+# keeps a unique solution, which leaves a minimal puzzle. Most minimal
+# puzzles are solved by propagation with little or no search, so a
+# candidate is only kept if the 'mrv' configuration needs at least
+# MIN_NODES search nodes for it.
+#
+# Example:
+#   python csp_code_handout/benchmark.py -r 5 -o results.jsonl
+#   python csp_code_handout/benchmark.py -c bitmask gac -i veryhard
+
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from Assignment import (create_map_coloring_csp, create_sudoku_csp,
+                        create_sudoku_csp_from_board)
+from dlx import solve_csp as solve_exact_cover
+from sat import solve_csp as solve_sat
+
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+# The bundled Sudoku boards
+BOARDS = ('easy', 'medium', 'hard', 'veryhard')
+
+# Default number of search nodes the 'mrv' configuration needs for a
+# generated puzzle to be kept, several times what veryhard.txt needs
+MIN_NODES = 50
+
+
+def search(**options):
+    """Return a solver that runs CSP.backtracking_search with 'options'
+    and counts its backtracks as the search nodes."""
+    def solve(csp):
+        return csp.backtracking_search(**options), csp.backtracks
+    return solve
+
+
+def backend(solve_csp):
+    """Return a solver for a backend whose 'solve_csp' leaves its
+    number of search nodes in `csp.backtracks`."""
+    def solve(csp):
+        return solve_csp(csp), csp.backtracks
+    return solve
+
+
+# Solver configurations: functions that solve a CSP and return
+# (solution, nodes). A solver raises ValueError for a CSP it cannot
+# express, and the instance is then reported as skipped
+CONFIGURATIONS = {
+    'backtrack': search(),
+    'trail': search(trail=True),
+    'bitmask': search(bitmask=True),
+    'bitmask-trail': search(bitmask=True, trail=True),
+    'mrv': search(bitmask=True, trail=True, ordering='mrv'),
+    'gac': search(bitmask=True, trail=True, gac=True, ordering='mrv'),
+    'mrv/wdeg-lcv': search(bitmask=True, trail=True, ordering='mrv/wdeg',
+                           lcv=True),
+    'learning': search(bitmask=True, trail=True, ordering='mrv',
+                       learning=True),
+    'restarts': search(bitmask=True, trail=True, ordering='mrv/wdeg',
+                       restarts='luby', seed=0),
+    'dlx': backend(solve_exact_cover),
+    'sat': backend(solve_sat),
+    'sat-direct': backend(lambda csp: solve_sat(csp, 'direct')),
+}
+
+
+def random_sudoku_grid(rng: random.Random) -> list:
+    """Return a random solved 9×9 grid, as nine strings of digits.
+
+    A fixed solved grid is shuffled with the transformations that keep
+    a grid solved: relabelling the digits, permuting the rows within a
+    band, the bands, the columns within a stack and the stacks, and
+    transposing.
+    """
+    digits = rng.sample('123456789', 9)
+    rows = [band * 3 + row for band in rng.sample(range(3), 3)
+            for row in rng.sample(range(3), 3)]
+    cols = [stack * 3 + col for stack in rng.sample(range(3), 3)
+            for col in rng.sample(range(3), 3)]
+    grid = [[digits[(row * 3 + row // 3 + col) % 9] for col in cols]
+            for row in rows]
+    if rng.random() < 0.5:
+        grid = [list(col) for col in zip(*grid)]
+    return [''.join(row) for row in grid]
+
+
+def generate_puzzle(seed: int) -> list:
+    """Generate a minimal Sudoku puzzle with a unique solution.
+
+    Parameters
+    ----------
+    seed : int
+        Seed of the random grid and of the order the clues are removed in
+
+    Returns
+    -------
+    list
+        Nine strings of nine cells, '0' for the empty cells
+    """
+    rng = random.Random(seed)
+    board = [list(row) for row in random_sudoku_grid(rng)]
+    cells = [(row, col) for row in range(9) for col in range(9)]
+    rng.shuffle(cells)
+    for (row, col) in cells:
+        clue = board[row][col]
+        board[row][col] = '0'
+        csp = create_sudoku_csp_from_board(board)
+        if csp.count_solutions(limit=2, gac=True, ordering='mrv') != 1:
+            board[row][col] = clue
+    return [''.join(row) for row in board]
+
+
+def generate_hard_puzzles(count: int, seed: int = 0,
+                          min_nodes: int = MIN_NODES):
+    """Generate puzzles with generate_puzzle from the seeds 'seed',
+    'seed' + 1, ..., and keep those the 'mrv' configuration needs at
+    least 'min_nodes' search nodes for.
+
+    Parameters
+    ----------
+    count : int
+        Number of puzzles to keep
+    seed : int
+        First seed to try
+    min_nodes : int
+        Search nodes a puzzle needs to be kept
+
+    Returns
+    -------
+    list
+        (seed, puzzle) pairs, in the order of the seeds
+    """
+    puzzles = []
+    while len(puzzles) < count:
+        board = generate_puzzle(seed)
+        csp = create_sudoku_csp_from_board(board)
+        (solution, nodes) = CONFIGURATIONS['mrv'](csp)
+        if nodes >= min_nodes:
+            puzzles.append((seed, board))
+        seed += 1
+    return puzzles
+
+
+def benchmark_instances(corpus: int = 5, seed: int = 0,
+                        min_nodes: int = MIN_NODES) -> dict:
+    """Return the instances of the benchmark.
+
+    Parameters
+    ----------
+    corpus : int
+        Number of generated puzzles
+    seed : int
+        First seed tried for the generated puzzles
+    min_nodes : int
+        Search nodes the 'mrv' configuration needs for a generated
+        puzzle, see generate_hard_puzzles
+
+    Returns
+    -------
+    dict
+        Maps the name of every instance to a function that builds a
+        fresh CSP for it
+    """
+    instances = {'map': create_map_coloring_csp}
+    for name in BOARDS:
+        path = os.path.join(DIRECTORY, name + '.txt')
+        instances[name] = lambda path=path: create_sudoku_csp(path)
+    for (puzzle_seed, board) in generate_hard_puzzles(corpus, seed,
+                                                      min_nodes):
+        instances['generated-%d' % puzzle_seed] = (
+            lambda board=board: create_sudoku_csp_from_board(board))
+    return instances
+
+
+def check_solution(csp, solution: dict):
+    """Raise ValueError if 'solution' does not give every variable of
+    'csp' one value of its domain that meets every constraint."""
+    for var in csp.variables:
+        value = solution[var]
+        if len(value) != 1 or value[0] not in csp.domains[var]:
+            raise ValueError('no legal value for %s' % var)
+    for i, constraints in csp.constraints.items():
+        for j, constraint in constraints.items():
+            if not constraint.allows(solution[i][0], solution[j][0]):
+                raise ValueError('constraint (%s, %s) is violated' % (i, j))
+
+
+def percentile(values: list, fraction: float):
+    """Return the 'fraction' percentile of 'values' by the nearest-rank
+    method."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def run_benchmark(instance: str, build, configuration: str, solve,
+                  repeats: int) -> dict:
+    """Solve one instance with one configuration 'repeats' times.
+
+    The solve time is measured without tracemalloc, and the peak memory
+    in one extra run with it, since tracing slows the search down.
+    Building the CSP is not part of the solve time.
+
+    Parameters
+    ----------
+    instance : str
+        Name of the instance
+    build : callable
+        Function that returns a fresh CSP for the instance
+    configuration : str
+        Name of the configuration
+    solve : callable
+        Solver of the configuration, see CONFIGURATIONS
+    repeats : int
+        Number of timed runs
+
+    Returns
+    -------
+    dict
+        The results
+    """
+    times = []
+    nodes = []
+    for repeat in range(repeats):
+        # The list engine picks its variables with the random module
+        random.seed(repeat)
+        csp = build()
+        started = time.perf_counter()
+        (solution, count) = solve(csp)
+        times.append(time.perf_counter() - started)
+        nodes.append(count)
+        if solution is None:
+            raise ValueError('%s: no solution found with %s'
+                             % (instance, configuration))
+        check_solution(csp, solution)
+
+    random.seed(0)
+    csp = build()
+    tracemalloc.start()
+    try:
+        solve(csp)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {'instance': instance,
+            'configuration': configuration,
+            'repeats': repeats,
+            'median_seconds': round(statistics.median(times), 6),
+            'p95_seconds': round(percentile(times, 0.95), 6),
+            'min_seconds': round(min(times), 6),
+            'median_nodes': statistics.median(nodes),
+            'max_nodes': max(nodes),
+            'peak_memory_kib': round(peak / 1024, 1)}
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark the configurations of the CSP solver.')
+    parser.add_argument('-r', '--repeats', type=int, default=5,
+                        help='timed runs per instance and configuration')
+    parser.add_argument('-c', '--configurations', nargs='+',
+                        choices=sorted(CONFIGURATIONS),
+                        default=list(CONFIGURATIONS),
+                        help='configurations to run (default: all)')
+    parser.add_argument('-i', '--instances', nargs='+', default=None,
+                        help='instances to run (default: all)')
+    parser.add_argument('--corpus', type=int, default=5,
+                        help='number of generated puzzles')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='first seed tried for the generated puzzles')
+    parser.add_argument('--min-nodes', type=int, default=MIN_NODES,
+                        help='search nodes the mrv configuration needs '
+                             'for a generated puzzle to be kept')
+    parser.add_argument('-o', '--output', default='-',
+                        help='JSON lines output file (default: stdout)')
+    args = parser.parse_args(argv)
+
+    instances = benchmark_instances(args.corpus, args.seed, args.min_nodes)
+    names = args.instances or list(instances)
+    for name in names:
+        if name not in instances:
+            parser.error('unknown instance %r' % name)
+
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        for name in names:
+            for configuration in args.configurations:
+                try:
+                    result = run_benchmark(name, instances[name],
+                                           configuration,
+                                           CONFIGURATIONS[configuration],
+                                           args.repeats)
+                except ValueError as error:
+                    result = {'instance': name,
+                              'configuration': configuration,
+                              'error': str(error)}
+                output.write(json.dumps(result) + '\n')
+                output.flush()
+                if 'error' in result:
+                    print('%-14s %-14s skipped: %s'
+                          % (name, configuration, result['error']),
+                          file=sys.stderr)
+                    continue
+                print('%-14s %-14s median %9.4f s  p95 %9.4f s  %8d nodes'
+                      % (name, configuration, result['median_seconds'],
+                         result['p95_seconds'], result['median_nodes']),
+                      file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
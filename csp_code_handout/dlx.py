@@ -0,0 +1,261 @@
+# Exact-cover backend
+#
+# Solves CSPs made of Alldiff constraints only, like the Sudoku CSPs of
+# create_sudoku_csp, as exact-cover problems with Knuth's Algorithm X on
+# dancing links. Every (variable, value) pair of the CSP is a row of the
+# matrix, and the columns are
+#
+# - one column per variable, covered by the row of the value it takes,
+# - one column per Alldiff and value of the Alldiff, covered by the
+#   variable of the Alldiff that takes the value.
+#
+# The column of an Alldiff value must be covered exactly once when the
+# Alldiff has as many variables as values, like the rows, columns and
+# boxes of a Sudoku. Otherwise it is a secondary column, which may be
+# covered at most once.
+#
+# Example:
+#   csp = create_sudoku_csp("csp_code_handout/veryhard.txt")
+#   print_sudoku_solution(solve_csp(csp))
+
+from Assignment import (AllDifferentConstraint, CSP, create_sudoku_csp,
+                        print_sudoku_solution)
+
+
+class ExactCover:
+    """Exact-cover matrix stored as dancing links.
+
+    The nodes live in flat lists of ints, indexed by node: the left,
+    right, up and down links, the column header of the node and the
+    label of its row. Node 0 is the root, and nodes 1 to 'columns' are
+    the column headers. Only the primary columns are linked into the
+    list of headers of the root, so the search never has to cover the
+    secondary ones.
+    """
+
+    def __init__(self, primary: int, secondary: int = 0):
+        """Create a matrix without rows.
+
+        Parameters
+        ----------
+        primary : int
+            Number of columns that must be covered exactly once. They
+            are the columns 0 to primary - 1
+        secondary : int
+            Number of columns that may be covered at most once, after
+            the primary ones
+        """
+        columns = primary + secondary
+        headers = range(columns + 1)
+        self.left = [k - 1 for k in headers]
+        self.right = [k + 1 for k in headers]
+        self.left[0] = primary
+        self.right[primary] = 0
+        for k in range(primary + 1, columns + 1):
+            self.left[k] = self.right[k] = k
+        self.up = list(headers)
+        self.down = list(headers)
+        self.column = list(headers)
+        self.labels = [None] * (columns + 1)
+        self.size = [0] * (columns + 1)
+
+        # Number of rows tried by the search
+        self.nodes = 0
+
+    def add_row(self, columns: list, label):
+        """Add a row with a 1 in each of 'columns'.
+
+        Parameters
+        ----------
+        columns : list
+            Numbers of the columns of the row
+        label
+            Returned by the search for every row of a solution
+        """
+        first = len(self.column)
+        for (k, col) in enumerate(columns):
+            node = first + k
+            header = col + 1
+            self.left.append(node - 1 if k else first + len(columns) - 1)
+            self.right.append(node + 1 if k < len(columns) - 1 else first)
+            self.up.append(self.up[header])
+            self.down.append(header)
+            self.down[self.up[header]] = node
+            self.up[header] = node
+            self.column.append(header)
+            self.labels.append(label)
+            self.size[header] += 1
+
+    def cover(self, header: int):
+        """Remove column 'header' from the header list, and every row
+        that has a 1 in it from the other columns."""
+        left, right, up, down = self.left, self.right, self.up, self.down
+        column, size = self.column, self.size
+        right[left[header]] = right[header]
+        left[right[header]] = left[header]
+        row = down[header]
+        while row != header:
+            node = right[row]
+            while node != row:
+                down[up[node]] = down[node]
+                up[down[node]] = up[node]
+                size[column[node]] -= 1
+                node = right[node]
+            row = down[row]
+
+    def uncover(self, header: int):
+        """Undo `cover` of column 'header', in the reverse order."""
+        left, right, up, down = self.left, self.right, self.up, self.down
+        column, size = self.column, self.size
+        row = up[header]
+        while row != header:
+            node = left[row]
+            while node != row:
+                size[column[node]] += 1
+                down[up[node]] = node
+                up[down[node]] = node
+                node = left[node]
+            row = up[row]
+        right[left[header]] = header
+        left[right[header]] = header
+
+    def solutions(self):
+        """Generate the exact covers of the matrix.
+
+        Yields
+        ------
+        list
+            The labels of the rows of a solution. The list is changed by
+            the search afterwards
+        """
+        yield from self.search([])
+
+    def search(self, chosen: list):
+        """Algorithm X below the rows in 'chosen', branching on the
+        primary column with the fewest rows."""
+        right, down = self.right, self.down
+        column, size = self.column, self.size
+        header = right[0]
+        if header == 0:
+            yield chosen
+            return
+        best = header
+        while header != 0:
+            if size[header] < size[best]:
+                best = header
+                if size[best] <= 1:
+                    break
+            header = right[header]
+
+        self.cover(best)
+        row = down[best]
+        while row != best:
+            self.nodes = self.nodes + 1
+            chosen.append(self.labels[row])
+            node = right[row]
+            while node != row:
+                self.cover(column[node])
+                node = right[node]
+            yield from self.search(chosen)
+            node = self.left[row]
+            while node != row:
+                self.uncover(column[node])
+                node = self.left[node]
+            chosen.pop()
+            row = down[row]
+        self.uncover(best)
+
+
+def compile_exact_cover(csp: CSP) -> ExactCover:
+    """Build the exact-cover matrix of 'csp', see the top of the module.
+    The label of a row is its (variable, value) pair.
+
+    Parameters
+    ----------
+    csp : CSP
+        A CSP whose constraints all come from add_all_different_constraint
+
+    Returns
+    -------
+    ExactCover
+        The matrix
+    """
+    for (i, constraints) in csp.constraints.items():
+        for (j, constraint) in constraints.items():
+            if not isinstance(constraint, AllDifferentConstraint):
+                raise ValueError('constraint (%s, %s) is not an Alldiff, '
+                                 'which exact cover cannot express' % (i, j))
+
+    var_columns = {var: k for (k, var) in enumerate(csp.variables)}
+    primary = []
+    secondary = []
+    for constraint in csp.all_different_constraints:
+        values = []
+        for var in constraint.variables:
+            for value in csp.domains[var]:
+                if value not in values:
+                    values.append(value)
+        if len(values) == len(constraint.variables):
+            primary.append((constraint, values))
+        else:
+            secondary.append((constraint, values))
+
+    # value_columns[var][value] lists the Alldiff columns of the value
+    value_columns = {var: {value: [] for value in csp.domains[var]}
+                     for var in csp.variables}
+    primary_count = len(csp.variables)
+    for (constraint, values) in primary:
+        primary_count += len(values)
+    count = len(csp.variables)
+    for (constraint, values) in primary + secondary:
+        for var in constraint.variables:
+            for (k, value) in enumerate(values):
+                if value in value_columns[var]:
+                    value_columns[var][value].append(count + k)
+        count += len(values)
+
+    cover = ExactCover(primary_count, count - primary_count)
+    for var in csp.variables:
+        for value in csp.domains[var]:
+            cover.add_row([var_columns[var]] + value_columns[var][value],
+                          (var, value))
+    return cover
+
+
+def iter_csp_solutions(csp: CSP):
+    """Generate the solutions of 'csp' with the exact-cover backend.
+    `csp.backtracks` is set to the number of rows tried so far.
+
+    Yields
+    ------
+    dict
+        A solution, in the format of CSP.backtracking_search
+    """
+    cover = compile_exact_cover(csp)
+    for rows in cover.solutions():
+        csp.backtracks = cover.nodes
+        yield {var: [value] for (var, value) in rows}
+    csp.backtracks = cover.nodes
+
+
+def solve_csp(csp: CSP):
+    """Solve 'csp' with the exact-cover backend.
+
+    Parameters
+    ----------
+    csp : CSP
+        A CSP whose constraints all come from add_all_different_constraint
+
+    Returns
+    -------
+    dict | None
+        A solution in the format of CSP.backtracking_search, or None if
+        there is none
+    """
+    return next(iter_csp_solutions(csp), None)
+
+
+if __name__ == "__main__":
+    sudoku = create_sudoku_csp("csp_code_handout/veryhard.txt")
+    print_sudoku_solution(solve_csp(sudoku))
+    print("number of rows tried: ", sudoku.backtracks)
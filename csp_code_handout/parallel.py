@@ -0,0 +1,236 @@
+# Parallel CSP search
+#
+# Solves a single CSP on several cores with the bitmask engine of the
+# CSP class, in one of two ways:
+#
+# - Splitting: the top levels of the search tree are expanded into many
+#   subproblems, each given by the decisions on its path. The worker
+#   processes take the next subproblem from a shared queue as soon as
+#   they are done with the last one, so a worker that finishes early
+#   takes over work that would otherwise wait for a busy worker.
+# - Portfolio: every worker solves the whole CSP with its own
+#   configuration and seed, and the first one to finish wins.
+#
+# In both cases the workers are terminated as soon as a solution is
+# found. They are plain processes rather than a multiprocessing.Pool,
+# whose terminate() can hang when it kills a worker that is writing a
+# result.
+#
+# Example:
+#   csp = create_sudoku_csp("csp_code_handout/veryhard.txt")
+#   solution = parallel_backtracking_search(csp, workers=4, gac=True)
+
+import multiprocessing
+
+from Assignment import CSP, create_sudoku_csp, print_sudoku_solution
+
+
+# Search options used by the workers, on top of the options given to
+# parallel_backtracking_search
+SEARCH_OPTIONS = dict(bitmask=True, trail=True, ordering='mrv')
+
+# Configurations of the portfolio, used in turn by the workers. Each
+# worker gets its own seed, so workers with the same configuration still
+# search differently
+PORTFOLIO = (dict(ordering='mrv/wdeg', restarts='luby'),
+             dict(ordering='mrv', lcv=True, restarts='luby'),
+             dict(ordering='degree', learning=True, restarts='geometric'),
+             dict(ordering='mrv/wdeg', learning=True, lcv=True,
+                  restarts='luby'))
+
+# The CSP and options of a worker process, set by run_worker
+worker_csp = None
+worker_options = None
+
+
+def run_worker(csp: CSP, options: dict, solve, tasks, results):
+    """Main function of the worker processes: solve the tasks of the
+    queue 'tasks' with 'solve' until a None task, and put the results on
+    the queue 'results' as (True, result), or (False, exception) when
+    'solve' raises one."""
+    global worker_csp, worker_options
+    worker_csp = csp
+    worker_options = options
+    for task in iter(tasks.get, None):
+        try:
+            results.put((True, solve(task)))
+        except Exception as error:
+            results.put((False, error))
+
+
+def solve_subproblem(assumptions: list) -> tuple:
+    """Solve the part of the search space below 'assumptions'.
+
+    Parameters
+    ----------
+    assumptions : list
+        (variable, value) decisions of the subproblem
+
+    Returns
+    -------
+    tuple
+        (solution, backtracks), where 'solution' is None if the
+        subproblem has no solution
+    """
+    worker_csp.backtracks = 0
+    solution = worker_csp.backtracking_search(assumptions=assumptions,
+                                              **worker_options)
+    return solution, worker_csp.backtracks
+
+
+def solve_configuration(configuration: dict) -> tuple:
+    """Solve the whole CSP with one configuration of the portfolio.
+
+    Parameters
+    ----------
+    configuration : dict
+        Options for CSP.backtracking_search, on top of the options of
+        the worker
+
+    Returns
+    -------
+    tuple
+        (solution, backtracks)
+    """
+    worker_csp.backtracks = 0
+    options = dict(worker_options)
+    options.update(configuration)
+    solution = worker_csp.backtracking_search(**options)
+    return solution, worker_csp.backtracks
+
+
+def split_problem(csp: CSP, count: int, gac: bool = False,
+                  max_depth: int = 8) -> list:
+    """Split the search space of 'csp' into at least 'count'
+    subproblems, by deciding the variable with the smallest domain one
+    level at a time. Branches that propagation refutes are left out.
+
+    Parameters
+    ----------
+    csp : CSP
+        The CSP to split
+    count : int
+        Number of subproblems to aim for
+    gac : bool
+        Propagate the Alldiff constraints as global constraints
+    max_depth : int
+        Number of levels to split at most
+
+    Returns
+    -------
+    list
+        Lists of (variable, value) decisions
+    """
+    subproblems = [[]]
+    for depth in range(max_depth):
+        if len(subproblems) >= count:
+            break
+        expanded = []
+        for assumptions in subproblems:
+            domains = csp.propagate(assumptions, gac)
+            if domains is None:
+                continue
+            undecided = [var for var in csp.variables
+                         if len(domains[var]) > 1]
+            if not undecided:
+                expanded.append(assumptions)
+                continue
+            var = min(undecided, key=lambda var: len(domains[var]))
+            for value in domains[var]:
+                expanded.append(assumptions + [(var, value)])
+        subproblems = expanded
+    return subproblems
+
+
+def parallel_backtracking_search(csp: CSP, workers: int = None,
+                                 portfolio: bool = False, **options):
+    """Solve 'csp' on worker processes.
+
+    The workers get their own copy of the CSP: forked from this process
+    where the platform allows it, otherwise pickled, which needs
+    constraints without lambdas. `csp.backtracks` is set to the sum of
+    the backtracks of the tasks that have finished. It leaves out the
+    tasks that are still running when a solution is found, and the
+    propagation done here by split_problem, which can leave nothing to
+    search (as with veryhard.txt and gac), so it is no measure of the
+    work done.
+
+    Parameters
+    ----------
+    csp : CSP
+        The CSP to solve
+    workers : int
+        Number of worker processes, all cores if None
+    portfolio : bool
+        Race the configurations of `PORTFOLIO` instead of splitting the
+        search space
+    **options
+        Options for CSP.backtracking_search, on top of `SEARCH_OPTIONS`
+
+    Returns
+    -------
+    dict | None
+        A solution in the format of CSP.backtracking_search, or None if
+        there is none
+    """
+    workers = workers or multiprocessing.cpu_count()
+    search_options = dict(SEARCH_OPTIONS)
+    search_options.update(options)
+
+    if portfolio:
+        tasks = []
+        for k in range(workers):
+            configuration = dict(PORTFOLIO[k % len(PORTFOLIO)])
+            configuration['seed'] = k
+            tasks.append(configuration)
+        solve = solve_configuration
+    else:
+        tasks = split_problem(csp, workers * 8,
+                              search_options.get('gac', False))
+        solve = solve_subproblem
+
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()
+
+    task_queue = context.Queue()
+    result_queue = context.Queue()
+    for task in tasks:
+        task_queue.put(task)
+    processes = [context.Process(target=run_worker,
+                                 args=(csp, search_options, solve,
+                                       task_queue, result_queue))
+                 for k in range(min(workers, len(tasks)))]
+    for process in processes:
+        task_queue.put(None)
+
+    csp.backtracks = 0
+    try:
+        for process in processes:
+            process.start()
+        for task in tasks:
+            (ok, result) = result_queue.get()
+            if not ok:
+                raise result
+            (solution, backtracks) = result
+            csp.backtracks += backtracks
+            if solution is not None:
+                return solution
+        return None
+    finally:
+        # Stop the workers that are still busy when a solution has been
+        # found, without waiting for the tasks they have not taken
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+        task_queue.cancel_join_thread()
+        task_queue.close()
+        result_queue.close()
+
+
+if __name__ == "__main__":
+    sudoku = create_sudoku_csp("csp_code_handout/veryhard.txt")
+    print_sudoku_solution(parallel_backtracking_search(sudoku, gac=True))
@@ -0,0 +1,488 @@
+# SAT backend
+#
+# Compiles a CSP into CNF and solves it with the CDCL solver below.
+#
+# Every (variable, value) pair of the CSP is a boolean variable, true
+# when the variable takes the value. A CSP variable takes at least one
+# and at most one value of its domain. A binary constraint on an arc
+# (i, j) becomes clauses in one of the ENCODINGS:
+#
+# - 'support': value 'a' of 'i' implies one of the values of 'j' that
+#   support it, (-i=a or j=b1 or j=b2 ...)
+# - 'direct': every pair of values that is not allowed is excluded,
+#   (-i=a or -j=b)
+#
+# The arcs of an Alldiff are not encoded one by one. Instead every value
+# of the Alldiff is taken by at most one of its variables, and by at
+# least one when the Alldiff has as many variables as values. The "at
+# most one" constraints use the sequential counter encoding once they
+# get longer than a few literals.
+#
+# The solver is a conflict-driven clause learning solver with two
+# watched literals per clause, first-UIP conflict analysis, VSIDS
+# variable activities, phase saving and Luby restarts.
+#
+# Example:
+#   csp = create_sudoku_csp("csp_code_handout/veryhard.txt")
+#   print_sudoku_solution(solve_csp(csp))
+
+import heapq
+
+from Assignment import (AllDifferentConstraint, CSP, create_sudoku_csp,
+                        luby, print_sudoku_solution)
+
+
+# Encodings of the binary constraints
+ENCODINGS = ('support', 'direct')
+
+# "At most one" constraints over at most this many literals are encoded
+# pairwise, longer ones with a sequential counter
+PAIRWISE_LIMIT = 6
+
+
+class CNFEncoding:
+    """The CNF of a CSP, see the top of the module.
+
+    Boolean variables are numbered from 1, and a literal is a variable
+    or its negation, like in the DIMACS format.
+    """
+
+    def __init__(self, csp: CSP, encoding: str = 'support'):
+        """Encode 'csp'.
+
+        Parameters
+        ----------
+        csp : CSP
+            The CSP to encode
+        encoding : str
+            One of ENCODINGS, used for the binary constraints
+        """
+        if encoding not in ENCODINGS:
+            raise ValueError("unknown encoding %r" % encoding)
+        self.variables = list(csp.variables)
+        self.count = 0
+        self.clauses = []
+
+        # self.literals[var][value] is the literal of 'var' = 'value'
+        self.literals = {}
+        for var in csp.variables:
+            self.literals[var] = {value: self.new_variable()
+                                  for value in csp.domains[var]}
+            literals = list(self.literals[var].values())
+            self.clauses.append(literals)
+            self.at_most_one(literals)
+
+        for constraint in csp.all_different_constraints:
+            values = []
+            for var in constraint.variables:
+                for value in csp.domains[var]:
+                    if value not in values:
+                        values.append(value)
+            for value in values:
+                literals = [self.literals[var][value]
+                            for var in constraint.variables
+                            if value in self.literals[var]]
+                self.at_most_one(literals)
+                if len(values) == len(constraint.variables):
+                    self.clauses.append(literals)
+
+        excluded = set()
+        for (i, constraints) in csp.constraints.items():
+            for (j, constraint) in constraints.items():
+                if isinstance(constraint, AllDifferentConstraint):
+                    continue
+                domain_j = csp.domains[j]
+                for value in csp.domains[i]:
+                    literal = self.literals[i][value]
+                    if encoding == 'support':
+                        supports = constraint.supports(value, domain_j)
+                        if len(supports) < len(domain_j):
+                            self.clauses.append(
+                                [-literal] + [self.literals[j][other]
+                                              for other in supports])
+                        continue
+                    for other in domain_j:
+                        if not constraint.allows(value, other):
+                            pair = (min(literal, self.literals[j][other]),
+                                    max(literal, self.literals[j][other]))
+                            if pair not in excluded:
+                                excluded.add(pair)
+                                self.clauses.append([-pair[0], -pair[1]])
+
+    def new_variable(self) -> int:
+        """Return a new boolean variable."""
+        self.count = self.count + 1
+        return self.count
+
+    def at_most_one(self, literals: list):
+        """Add clauses that allow at most one of 'literals' to be true.
+
+        Parameters
+        ----------
+        literals : list
+            The literals
+        """
+        if len(literals) <= PAIRWISE_LIMIT:
+            for (k, first) in enumerate(literals):
+                for second in literals[k + 1:]:
+                    self.clauses.append([-first, -second])
+            return
+
+        # counter[k] is true when one of literals[0..k] is true
+        counter = [self.new_variable() for literal in literals[:-1]]
+        self.clauses.append([-literals[0], counter[0]])
+        for k in range(1, len(literals) - 1):
+            self.clauses.append([-literals[k], counter[k]])
+            self.clauses.append([-counter[k - 1], counter[k]])
+            self.clauses.append([-literals[k], -counter[k - 1]])
+        self.clauses.append([-literals[-1], -counter[-1]])
+
+    def decode(self, solver: 'CDCLSolver') -> dict:
+        """Return the assignment of the model found by 'solver', in the
+        format of CSP.backtracking_search."""
+        return {var: [value for (value, literal) in self.literals[var].items()
+                      if solver.value(literal) == 1]
+                for var in self.variables}
+
+
+class CDCLSolver:
+    """Conflict-driven clause learning SAT solver.
+
+    The truth value of every literal is kept in `self.values`, indexed
+    by the literal plus `self.count`, so that a literal and its negation
+    are looked up the same way: 1 for true, -1 for false and 0 while the
+    variable is unassigned. The first two literals of every clause with
+    more than one literal are its watched literals, and
+    `self.watches` holds the clauses watching each literal, with the
+    same indexing. A clause only needs to be visited when one of its
+    watched literals becomes false.
+    """
+
+    def __init__(self, count: int):
+        """Create a solver without clauses.
+
+        Parameters
+        ----------
+        count : int
+            Number of boolean variables, numbered from 1
+        """
+        self.count = count
+        self.values = [0] * (2 * count + 1)
+        self.watches = [[] for literal in range(2 * count + 1)]
+        self.clauses = []
+        self.learnts = []
+        self.ok = True
+
+        # The trail of assigned literals, the position on the trail
+        # where every decision level starts, the level and reason
+        # clause of every variable, and the position of the next
+        # literal to propagate
+        self.trail = []
+        self.trail_limits = []
+        self.levels = [0] * (count + 1)
+        self.reasons = [None] * (count + 1)
+        self.head = 0
+
+        # VSIDS activities, kept in a heap with lazy deletion, and the
+        # last value every variable had (phase saving)
+        self.activity = [0.0] * (count + 1)
+        self.increment = 1.0
+        self.decay = 0.95
+        self.heap = [(0.0, var) for var in range(1, count + 1)]
+        self.phases = [False] * (count + 1)
+        self.seen = [False] * (count + 1)
+
+        self.decisions = 0
+        self.conflicts = 0
+        self.propagations = 0
+        self.restarts = 0
+
+    def value(self, literal: int) -> int:
+        """Return 1 if 'literal' is true, -1 if it is false and 0 if it
+        is unassigned."""
+        return self.values[literal + self.count]
+
+    def add_clause(self, literals: list) -> bool:
+        """Add a clause before solving.
+
+        Parameters
+        ----------
+        literals : list
+            The literals of the clause
+
+        Returns
+        -------
+        bool
+            False if the clauses added so far are unsatisfiable
+        """
+        if not self.ok:
+            return False
+        clause = []
+        for literal in literals:
+            value = self.value(literal)
+            if value == 1 or -literal in clause:
+                return True
+            if value == 0 and literal not in clause:
+                clause.append(literal)
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.assign(clause[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.clauses.append(clause)
+            self.watch(clause)
+        return self.ok
+
+    def watch(self, clause: list):
+        """Watch the first two literals of 'clause'."""
+        self.watches[clause[0] + self.count].append(clause)
+        self.watches[clause[1] + self.count].append(clause)
+
+    def assign(self, literal: int, reason: list):
+        """Make 'literal' true at the current decision level. 'reason'
+        is the clause that implied it, with 'literal' first, or None
+        for a decision."""
+        var = abs(literal)
+        self.values[literal + self.count] = 1
+        self.values[-literal + self.count] = -1
+        self.levels[var] = len(self.trail_limits)
+        self.reasons[var] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """Unit propagation over the watched literals.
+
+        Returns
+        -------
+        list | None
+            A clause whose literals are all false, or None
+        """
+        values = self.values
+        watches = self.watches
+        offset = self.count
+        trail = self.trail
+        while self.head < len(trail):
+            false_literal = -trail[self.head]
+            self.head += 1
+            self.propagations += 1
+            watching = watches[false_literal + offset]
+            kept = []
+            k = 0
+            while k < len(watching):
+                clause = watching[k]
+                k += 1
+                if clause[0] == false_literal:
+                    clause[0] = clause[1]
+                    clause[1] = false_literal
+                first = clause[0]
+                if values[first + offset] == 1:
+                    kept.append(clause)
+                    continue
+                for position in range(2, len(clause)):
+                    other = clause[position]
+                    if values[other + offset] != -1:
+                        clause[1] = other
+                        clause[position] = false_literal
+                        watches[other + offset].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if values[first + offset] == -1:
+                        kept.extend(watching[k:])
+                        watches[false_literal + offset] = kept
+                        self.head = len(trail)
+                        return clause
+                    self.assign(first, clause)
+            watches[false_literal + offset] = kept
+        return None
+
+    def analyze(self, conflict: list) -> tuple:
+        """Derive the first-UIP clause of 'conflict'.
+
+        The literals of the current decision level in the conflict are
+        resolved away with their reason clauses, in the reverse order
+        of the trail, until a single one is left: the first unique
+        implication point.
+
+        Returns
+        -------
+        tuple
+            (learnt, level): the learnt clause, with the negation of the
+            UIP first and a literal of 'level' second, and the level to
+            jump back to
+        """
+        seen = self.seen
+        levels = self.levels
+        level = len(self.trail_limits)
+        learnt = [0]
+        pending = 0
+        literal = None
+        position = len(self.trail) - 1
+        clause = conflict
+        while True:
+            for other in (clause if literal is None else clause[1:]):
+                var = abs(other)
+                if not seen[var] and levels[var] > 0:
+                    seen[var] = True
+                    self.bump(var)
+                    if levels[var] == level:
+                        pending += 1
+                    else:
+                        learnt.append(other)
+            while not seen[abs(self.trail[position])]:
+                position -= 1
+            literal = self.trail[position]
+            position -= 1
+            seen[abs(literal)] = False
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.reasons[abs(literal)]
+        learnt[0] = -literal
+
+        for other in learnt[1:]:
+            seen[abs(other)] = False
+        if len(learnt) == 1:
+            return learnt, 0
+        highest = max(range(1, len(learnt)),
+                      key=lambda k: levels[abs(learnt[k])])
+        learnt[1], learnt[highest] = learnt[highest], learnt[1]
+        return learnt, levels[abs(learnt[1])]
+
+    def bump(self, var: int):
+        """Raise the activity of 'var'."""
+        self.activity[var] += self.increment
+        if self.activity[var] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.increment *= 1e-100
+            self.heap = [(-self.activity[var], var)
+                         for var in range(1, self.count + 1)]
+            heapq.heapify(self.heap)
+        else:
+            heapq.heappush(self.heap, (-self.activity[var], var))
+
+    def cancel_until(self, level: int):
+        """Undo the assignments of the decision levels above 'level'."""
+        if len(self.trail_limits) <= level:
+            return
+        start = self.trail_limits[level]
+        offset = self.count
+        for literal in self.trail[start:]:
+            var = abs(literal)
+            self.values[literal + offset] = 0
+            self.values[-literal + offset] = 0
+            self.reasons[var] = None
+            self.phases[var] = literal > 0
+            heapq.heappush(self.heap, (-self.activity[var], var))
+        del self.trail[start:]
+        del self.trail_limits[level:]
+        self.head = start
+
+    def pick_branching_variable(self):
+        """Return the unassigned variable with the highest activity, or
+        None if every variable is assigned."""
+        heap = self.heap
+        while heap:
+            (activity, var) = heapq.heappop(heap)
+            if self.values[var + self.count] == 0 \
+                    and -activity == self.activity[var]:
+                return var
+        # Entries are only dropped while their variable is assigned, or
+        # when a newer entry has been pushed, so every variable is set
+        return None
+
+    def search(self, limit: int):
+        """Search until the clauses are solved, proved unsatisfiable, or
+        'limit' conflicts have happened.
+
+        Returns
+        -------
+        bool | None
+            True if a model has been found, False if there is none, and
+            None when the search has to be restarted
+        """
+        conflicts = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                conflicts += 1
+                if not self.trail_limits:
+                    return False
+                (learnt, level) = self.analyze(conflict)
+                self.cancel_until(level)
+                if len(learnt) == 1:
+                    self.assign(learnt[0], None)
+                else:
+                    self.learnts.append(learnt)
+                    self.watch(learnt)
+                    self.assign(learnt[0], learnt)
+                self.increment /= self.decay
+                continue
+
+            if conflicts >= limit:
+                self.cancel_until(0)
+                return None
+            var = self.pick_branching_variable()
+            if var is None:
+                return True
+            self.decisions += 1
+            self.trail_limits.append(len(self.trail))
+            self.assign(var if self.phases[var] else -var, None)
+
+    def solve(self, restart_base: int = 100) -> bool:
+        """Solve the clauses, restarting after a Luby sequence of
+        'restart_base' conflicts.
+
+        Returns
+        -------
+        bool
+            True if the clauses are satisfiable, with the model in
+            `self.values`
+        """
+        if not self.ok:
+            return False
+        run = 1
+        while True:
+            result = self.search(restart_base * luby(run))
+            if result is not None:
+                self.ok = result
+                return result
+            self.restarts += 1
+            run += 1
+
+
+def solve_csp(csp: CSP, encoding: str = 'support'):
+    """Solve 'csp' with the SAT backend. `csp.backtracks` is set to the
+    number of decisions of the solver.
+
+    Parameters
+    ----------
+    csp : CSP
+        The CSP to solve
+    encoding : str
+        One of ENCODINGS
+
+    Returns
+    -------
+    dict | None
+        A solution in the format of CSP.backtracking_search, or None if
+        there is none
+    """
+    cnf = CNFEncoding(csp, encoding)
+    solver = CDCLSolver(cnf.count)
+    for clause in cnf.clauses:
+        if not solver.add_clause(clause):
+            break
+    satisfiable = solver.solve()
+    csp.backtracks = solver.decisions
+    if not satisfiable:
+        return None
+    return cnf.decode(solver)
+
+
+if __name__ == "__main__":
+    sudoku = create_sudoku_csp("csp_code_handout/veryhard.txt")
+    print_sudoku_solution(solve_csp(sudoku))
+    print("number of decisions: ", sudoku.backtracks)
@@ -0,0 +1,261 @@
+# Binary snapshots of CSPs
+#
+# A snapshot holds a CSP in the integer-indexed form of the bitmask
+# engine (see CSP.compile_bitmask): the variable names, the values,
+# every domain as a bitset, the Alldiff groups as lists of variable
+# indices, and for every arc either the group of its Alldiff or the
+# support bitset of every value in the domain of its first variable.
+# Loading a snapshot fills in the compiled form directly, so the CSP can
+# be solved with the bitmask engine without being built or compiled
+# again. The other constraints of the loaded CSP are Alldiffs and
+# SupportMaskConstraints on the stored bitsets, so the list engine can
+# solve it as well.
+#
+# Layout, little-endian, all counts and indices as unsigned 32-bit ints:
+#
+#   magic b'CSPS', version (u16), bitset width in bytes (u16)
+#   value count, values          (tag byte, then the value, see below)
+#   variable count, variable names
+#   per variable: domain bitset
+#   group count, per group: size, variable indices
+#   per variable: arc count, (j, group + 1) per arc with 0 for a table
+#       arc, then per table arc one support bitset per value of the
+#       domain of the variable, in bit order
+#
+# Values and names are strings (tag 0, length, UTF-8 bytes) or ints
+# (tag 1, signed 64-bit int). Bitsets are 'width' bytes.
+#
+# Example:
+#   save_snapshot(create_sudoku_csp("csp_code_handout/veryhard.txt"),
+#                 "veryhard.csps")
+#   csp = load_snapshot("veryhard.csps")
+#   solution = csp.backtracking_search(bitmask=True, trail=True)
+
+import struct
+
+from Assignment import (AllDifferentConstraint, CSP, Constraint,
+                        create_sudoku_csp, print_sudoku_solution)
+
+
+MAGIC = b'CSPS'
+VERSION = 1
+
+HEADER = struct.Struct('<4sHH')
+COUNT = struct.Struct('<I')
+INTEGER = struct.Struct('<q')
+
+
+class SupportMaskConstraint(Constraint):
+    """Constraint of an arc (i, j) of a loaded snapshot, given by the
+    support bitset of every value of 'i' in the compiled CSP.
+    """
+
+    def __init__(self, csp: CSP, table: list):
+        self.csp = csp
+        self.table = table
+
+    def allows(self, x, y) -> bool:
+        positions = self.csp.bit_positions
+        if x not in positions or y not in positions:
+            return False
+        return bool(self.table[positions[x]] >> positions[y] & 1)
+
+    def supports(self, x, values: list) -> list:
+        if x not in self.csp.bit_positions:
+            return []
+        mask = self.table[self.csp.bit_positions[x]]
+        return [y for y in values if mask & 1 << self.csp.bit_positions[y]]
+
+
+def pack_item(item) -> bytes:
+    """Pack a value or variable name."""
+    if isinstance(item, str):
+        data = item.encode('utf-8')
+        return b'\x00' + COUNT.pack(len(data)) + data
+    if isinstance(item, int) and not isinstance(item, bool):
+        return b'\x01' + INTEGER.pack(item)
+    raise ValueError('cannot store %r in a snapshot, only str and int'
+                     % (item,))
+
+
+def encode_snapshot(csp: CSP) -> bytes:
+    """Return the snapshot of 'csp', see the top of the module.
+
+    Parameters
+    ----------
+    csp : CSP
+        The CSP to store. Its variable names and values must be str or
+        int
+
+    Returns
+    -------
+    bytes
+        The snapshot
+    """
+    csp.compile_bitmask(csp.bitmask_gac or False)
+    width = max(1, (len(csp.bit_values) + 7) // 8)
+    parts = [HEADER.pack(MAGIC, VERSION, width)]
+
+    for items in (csp.bit_values, csp.variables):
+        parts.append(COUNT.pack(len(items)))
+        parts.extend(pack_item(item) for item in items)
+    parts.extend(mask.to_bytes(width, 'little') for mask in csp.bit_domains)
+
+    parts.append(COUNT.pack(len(csp.bit_groups)))
+    for variables in csp.bit_groups:
+        parts.append(COUNT.pack(len(variables)))
+        parts.extend(COUNT.pack(var) for var in variables)
+
+    groups = {id(constraint): group for (group, constraint)
+              in enumerate(csp.all_different_constraints)}
+    for (i, var) in enumerate(csp.variables):
+        supports = csp.bit_supports[i]
+        arcs = []
+        for (j, table) in supports.items():
+            group = 0
+            if table is None:
+                constraint = csp.constraints[var][csp.variables[j]]
+                if id(constraint) not in groups:
+                    raise ValueError('the Alldiff on arc (%s, %s) was not '
+                                     'added with add_all_different_'
+                                     'constraint' % (var, csp.variables[j]))
+                group = groups[id(constraint)] + 1
+            arcs.extend((j, group))
+        parts.append(COUNT.pack(len(supports)))
+        parts.append(struct.pack('<%dI' % len(arcs), *arcs))
+        for table in supports.values():
+            if table is None:
+                continue
+            rest = csp.bit_domains[i]
+            while rest:
+                bit = rest & -rest
+                parts.append(table[bit.bit_length() - 1].to_bytes(width,
+                                                                  'little'))
+                rest ^= bit
+    return b''.join(parts)
+
+
+def decode_snapshot(data: bytes) -> CSP:
+    """Rebuild a CSP from a snapshot made by encode_snapshot. The CSP
+    comes back compiled for the bitmask engine, except for the arc
+    index, which is built on the first search.
+
+    Parameters
+    ----------
+    data : bytes
+        The snapshot
+
+    Returns
+    -------
+    CSP
+        The CSP
+    """
+    view = memoryview(data)
+    (magic, version, width) = HEADER.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise ValueError('not a CSP snapshot')
+    if version != VERSION:
+        raise ValueError('unsupported snapshot version %d' % version)
+    offset = HEADER.size
+
+    def read_count():
+        nonlocal offset
+        (count,) = COUNT.unpack_from(view, offset)
+        offset += COUNT.size
+        return count
+
+    def read_item():
+        nonlocal offset
+        tag = view[offset]
+        offset += 1
+        if tag == 1:
+            (item,) = INTEGER.unpack_from(view, offset)
+            offset += INTEGER.size
+            return item
+        length = read_count()
+        item = bytes(view[offset:offset + length]).decode('utf-8')
+        offset += length
+        return item
+
+    def read_mask():
+        nonlocal offset
+        mask = int.from_bytes(view[offset:offset + width], 'little')
+        offset += width
+        return mask
+
+    csp = CSP()
+    values = [read_item() for k in range(read_count())]
+    variables = [read_item() for k in range(read_count())]
+    csp.bit_values = values
+    csp.bit_positions = {value: k for (k, value) in enumerate(values)}
+    csp.var_index = {var: k for (k, var) in enumerate(variables)}
+    csp.bit_domains = [read_mask() for var in variables]
+    # Many variables share a domain, like the empty cells of a Sudoku
+    domains = {}
+    for (var, mask) in zip(variables, csp.bit_domains):
+        if mask not in domains:
+            domains[mask] = csp.mask_to_values(mask)
+        csp.variables.append(var)
+        csp.domains[var] = list(domains[mask])
+
+    groups = []
+    for group in range(read_count()):
+        size = read_count()
+        groups.append(struct.unpack_from('<%dI' % size, view, offset))
+        offset += COUNT.size * size
+    csp.bit_groups = tuple(groups)
+    csp.all_different_constraints = [
+        AllDifferentConstraint([variables[var] for var in group])
+        for group in groups]
+
+    # The constraint of an arc by its group + 1, None for a table arc
+    arc_constraints = [None] + csp.all_different_constraints
+    csp.bit_supports = []
+    for (i, var) in enumerate(variables):
+        count = read_count()
+        arcs = struct.unpack_from('<%dI' % (2 * count), view, offset)
+        offset += 8 * count
+        (targets, arc_groups) = (arcs[0::2], arcs[1::2])
+        supports = dict.fromkeys(targets)
+        constraints = csp.constraints[var] = dict(zip(
+            map(variables.__getitem__, targets),
+            map(arc_constraints.__getitem__, arc_groups)))
+        for (j, group) in zip(targets, arc_groups):
+            if group:
+                continue
+            table = [0] * len(values)
+            rest = csp.bit_domains[i]
+            while rest:
+                bit = rest & -rest
+                table[bit.bit_length() - 1] = read_mask()
+                rest ^= bit
+            supports[j] = table
+            constraints[variables[j]] = SupportMaskConstraint(csp, table)
+        csp.bit_supports.append(supports)
+
+    # The arcs are indexed by compile_bitmask on the first search, for
+    # its gac option
+    csp.arc_index_stale = True
+    csp.bitmask_stale = False
+    return csp
+
+
+def save_snapshot(csp: CSP, path: str):
+    """Write the snapshot of 'csp' to the file 'path'."""
+    with open(path, 'wb') as file:
+        file.write(encode_snapshot(csp))
+
+
+def load_snapshot(path: str) -> CSP:
+    """Read the CSP stored in the file 'path' by save_snapshot."""
+    with open(path, 'rb') as file:
+        return decode_snapshot(file.read())
+
+
+if __name__ == "__main__":
+    sudoku = create_sudoku_csp("csp_code_handout/veryhard.txt")
+    data = encode_snapshot(sudoku)
+    print("snapshot size: ", len(data))
+    sudoku = decode_snapshot(data)
+    print_sudoku_solution(sudoku.backtracking_search(bitmask=True,
+                                                     trail=True))
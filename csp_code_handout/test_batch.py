@@ -0,0 +1,148 @@
+# Regression checks for the batch solver of batch.py
+#
+# Run with: python -m pytest csp_code_handout
+
+import io
+import json
+import os
+import random
+
+import pytest
+
+import batch
+from batch import read_puzzles, solve_batch
+
+
+def board_from_file(name):
+    with open(os.path.join(os.path.dirname(__file__), name + '.txt')) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def relabeled_boards(count, seed=0):
+    """Return 'count' puzzles made from easy.txt by permuting its digits,
+    as lists of nine strings."""
+    rng = random.Random(seed)
+    board = board_from_file('easy')
+    boards = []
+    for k in range(count):
+        digits = rng.sample('123456789', 9)
+        table = str.maketrans('123456789', ''.join(digits))
+        boards.append([row.translate(table) for row in board])
+    return boards
+
+
+def assert_valid_solution(puzzle, solution):
+    assert len(solution) == 81
+    assert all(given in ('0', value)
+               for (given, value) in zip(puzzle, solution))
+    rows = [solution[row * 9:(row + 1) * 9] for row in range(9)]
+    units = rows + [''.join(column) for column in zip(*rows)]
+    units += [''.join(rows[row][col:col + 3]
+                      for row in range(top, top + 3))
+              for top in (0, 3, 6) for col in (0, 3, 6)]
+    assert all(sorted(unit) == list('123456789') for unit in units)
+
+
+def test_read_lines_and_blocks(tmp_path):
+    easy = board_from_file('easy')
+    hard = board_from_file('hard')
+    path = tmp_path / 'puzzles.txt'
+    path.write_text('# a comment\n'
+                    + ''.join(hard).replace('0', '.') + '\n\n'
+                    + '\n'.join(easy) + '\n'
+                    + ' '.join(''.join(easy)) + '\n')
+    puzzles = list(read_puzzles(str(path)))
+    assert [source for (source, board) in puzzles] == [
+        '%s:%d' % (path, number) for number in (2, 4, 13)]
+    assert [[''.join(row) for row in board]
+            for (source, board) in puzzles] == [hard, easy, easy]
+
+
+def test_read_directory(tmp_path):
+    boards = relabeled_boards(3)
+    for (k, board) in enumerate(boards):
+        (tmp_path / ('%d.txt' % k)).write_text('\n'.join(board) + '\n')
+    (tmp_path / 'subdirectory').mkdir()
+    assert [[''.join(row) for row in board]
+            for (source, board) in read_puzzles(str(tmp_path))] == boards
+
+
+def test_read_16x16_line(tmp_path):
+    cells = [str(k % 16 + 1) if k % 5 else '0' for k in range(256)]
+    path = tmp_path / 'puzzles.txt'
+    path.write_text(','.join(cells) + '\n')
+    ((source, board),) = read_puzzles(str(path))
+    assert len(board) == 16
+    assert [cell for row in board for cell in row] == cells
+
+
+@pytest.mark.parametrize('size', [10, 12])
+def test_line_is_a_puzzle_only_with_square_boxes(tmp_path, size):
+    # A line of 100 or 144 cells is the first row of a block, since 10
+    # and 12 are not squares
+    path = tmp_path / 'puzzles.txt'
+    path.write_text(' '.join(['0'] * size * size) + '\n')
+    with pytest.raises(ValueError, match='incomplete puzzle'):
+        list(read_puzzles(str(path)))
+
+
+def test_read_errors(tmp_path):
+    path = tmp_path / 'puzzles.txt'
+    path.write_text('004030050\n609400000\n00510048\n')
+    with pytest.raises(ValueError, match='row of 8 cells'):
+        list(read_puzzles(str(path)))
+    path.write_text('00403005x\n')
+    with pytest.raises(ValueError, match='not a Sudoku row'):
+        list(read_puzzles(str(path)))
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_solve_batch(tmp_path, workers):
+    boards = relabeled_boards(40) + [board_from_file('veryhard')]
+    path = tmp_path / 'puzzles.txt'
+    path.write_text(''.join(''.join(board) + '\n' for board in boards))
+    output = io.StringIO()
+    assert solve_batch(str(path), output, workers, chunksize=3) == len(boards)
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [result['source'] for result in results] == [
+        '%s:%d' % (path, number) for number in range(1, len(boards) + 1)]
+    for (board, result) in zip(boards, results):
+        assert result['puzzle'] == ''.join(board)
+        assert_valid_solution(result['puzzle'], result['solution'])
+
+
+def test_solve_batch_reads_ahead_a_bounded_number(monkeypatch):
+    boards = relabeled_boards(200)
+    read = []
+
+    def puzzles(path):
+        for (k, board) in enumerate(boards):
+            read.append(k)
+            yield 'puzzle %d' % k, board
+
+    class Output:
+        def __init__(self):
+            self.written = 0
+            self.ahead = []
+
+        def write(self, line):
+            self.written += 1
+            self.ahead.append(len(read) - self.written)
+
+    monkeypatch.setattr(batch, 'read_puzzles', puzzles)
+    output = Output()
+    assert solve_batch('', output, workers=2, chunksize=2) == len(boards)
+    assert output.written == len(boards)
+    assert max(output.ahead) <= 2 * 2 * 4
+    # Puzzles are read as results are written, not once every puzzle
+    # read so far has been solved
+    assert any(output.ahead[k - 1] for k in range(16, 180, 16))
+
+
+def test_solve_batch_raises_read_errors(tmp_path):
+    path = tmp_path / 'puzzles.txt'
+    path.write_text(''.join(''.join(board) + '\n'
+                            for board in relabeled_boards(20))
+                    + '00403005x\n')
+    with pytest.raises(ValueError, match='not a Sudoku row'):
+        solve_batch(str(path), io.StringIO(), workers=2, chunksize=2)
@@ -0,0 +1,37 @@
+# Regression checks for the Constraint classes of Assignment.py
+#
+# Run with: python -m pytest csp_code_handout
+
+import pytest
+
+from Assignment import (AllDifferentConstraint, Constraint,
+                        PredicateConstraint, TableConstraint)
+
+
+def test_allows_is_abstract():
+    class Incomplete(Constraint):
+        pass
+
+    with pytest.raises(TypeError):
+        Constraint()
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_subclass_with_allows():
+    class Less(Constraint):
+        def allows(self, x, y):
+            return x < y
+
+    assert Less().supports(2, [1, 2, 3, 4]) == [3, 4]
+    both = Less().conjoin(TableConstraint([(1, 2), (3, 1)]))
+    assert both.allows(1, 2)
+    assert not both.allows(3, 1)
+
+
+def test_constraints():
+    assert AllDifferentConstraint(['a', 'b']).supports(1, [1, 2]) == [2]
+    assert PredicateConstraint(lambda x, y: x + y == 3).allows(1, 2)
+    table = TableConstraint([(1, 2), (1, 3)])
+    assert table.supports(1, [1, 2, 3]) == [2, 3]
+    assert table.supports(2, [1, 2, 3]) == []
@@ -0,0 +1,46 @@
+# Regression checks for iter_solutions and count_solutions
+#
+# Run with: python -m pytest csp_code_handout
+
+import os
+
+from Assignment import (create_latin_square_csp, create_sudoku_csp,
+                        create_sudoku_csp_from_board)
+
+
+def test_empty_4x4_sudoku():
+    csp = create_sudoku_csp_from_board(['0000'] * 4)
+    assert csp.count_solutions() == 288
+    assert csp.count_solutions(gac=True, ordering='mrv') == 288
+
+
+def test_4x4_latin_square():
+    csp = create_latin_square_csp(4)
+    assert csp.count_solutions() == 576
+    assert csp.count_solutions(gac=True, ordering='mrv/wdeg', lcv=True) == 576
+
+
+def test_iter_solutions_are_distinct():
+    csp = create_latin_square_csp(3)
+    solutions = {tuple(sorted((var, values[0])
+                              for (var, values) in solution.items()))
+                 for solution in csp.iter_solutions()}
+    assert len(solutions) == 12
+
+
+def test_limit():
+    csp = create_latin_square_csp(3)
+    assert csp.count_solutions(limit=5) == 5
+    assert csp.count_solutions(limit=100) == 12
+    assert csp.count_solutions(limit=0) == 0
+    assert csp.count_solutions(limit=-1) == 0
+
+
+def test_failed_nodes_are_counted():
+    csp = create_sudoku_csp(
+        os.path.join(os.path.dirname(__file__), 'veryhard.txt'))
+    events = []
+    csp.trace = lambda event, **details: events.append(event)
+    assert csp.count_solutions() == 1
+    assert csp.statistics()['failed'] > 0
+    assert events.count('failure') == csp.statistics()['failed']
@@ -0,0 +1,75 @@
+# Regression checks for the parallel searches of parallel.py
+#
+# Run with: python -m pytest csp_code_handout
+
+import os
+
+import pytest
+
+from Assignment import (CSP, create_latin_square_csp, create_map_coloring_csp,
+                        create_sudoku_csp, create_sudoku_csp_from_board)
+from parallel import parallel_backtracking_search, split_problem
+
+
+def sudoku():
+    return create_sudoku_csp(
+        os.path.join(os.path.dirname(__file__), 'veryhard.txt'))
+
+
+def pigeonhole_csp():
+    """Return five pairwise different variables with four values, which
+    binary arc consistency does not refute."""
+    csp = CSP()
+    for k in range(5):
+        csp.add_variable('p%d' % k, [1, 2, 3, 4])
+    csp.add_all_different_constraint(['p%d' % k for k in range(5)])
+    return csp
+
+
+def assert_solution(csp, solution):
+    assert solution is not None
+    assert set(solution) == set(csp.variables)
+    for var in csp.variables:
+        assert len(solution[var]) == 1
+        assert solution[var][0] in csp.domains[var]
+    for (i, constraints) in csp.constraints.items():
+        for (j, constraint) in constraints.items():
+            assert constraint.allows(solution[i][0], solution[j][0]), (i, j)
+
+
+MODES = [{}, {'gac': True}, {'portfolio': True},
+         {'portfolio': True, 'gac': True}]
+
+
+@pytest.mark.parametrize('options', MODES, ids=str)
+@pytest.mark.parametrize('build', [sudoku, create_map_coloring_csp,
+                                   lambda: create_latin_square_csp(5)])
+def test_solutions(build, options):
+    csp = build()
+    assert_solution(csp, parallel_backtracking_search(csp, workers=2,
+                                                      **options))
+
+
+@pytest.mark.parametrize('options', MODES, ids=str)
+@pytest.mark.parametrize('build', [
+    pigeonhole_csp,
+    # Two 1s in the first row, which the root propagation refutes
+    lambda: create_sudoku_csp_from_board(['1100', '0000', '0000', '0000'])])
+def test_unsatisfiable(build, options):
+    assert parallel_backtracking_search(build(), workers=2, **options) is None
+
+
+def test_split_problem():
+    csp = pigeonhole_csp()
+    subproblems = split_problem(csp, 8)
+    assert len(subproblems) >= 8
+    assert len(set(map(tuple, subproblems))) == len(subproblems)
+    assert split_problem(csp, 8, gac=True) == []
+
+
+@pytest.mark.parametrize('options', [{'ordering': 'none'},
+                                     {'portfolio': True, 'trail': False}],
+                         ids=str)
+def test_worker_errors_are_raised(options):
+    with pytest.raises(ValueError):
+        parallel_backtracking_search(sudoku(), workers=2, **options)
@@ -0,0 +1,93 @@
+# Regression checks for the binary snapshots of snapshot.py
+#
+# Run with: python -m pytest csp_code_handout
+
+import os
+
+import pytest
+
+from Assignment import CSP, create_map_coloring_csp, create_sudoku_csp
+from snapshot import (decode_snapshot, encode_snapshot, load_snapshot,
+                      save_snapshot)
+
+
+def sudoku():
+    return create_sudoku_csp(
+        os.path.join(os.path.dirname(__file__), 'veryhard.txt'))
+
+
+def table_csp():
+    """Return a CSP with int values, table constraints and an Alldiff."""
+    csp = CSP()
+    for var in ('a', 'b', 'c', 'd'):
+        csp.add_variable(var, list(range(-2, 4)))
+    csp.add_table_constraint('a', 'b', [(x, x + 1) for x in range(-2, 3)])
+    csp.add_table_constraint('b', 'c', [(x, y) for x in range(-2, 4)
+                                        for y in range(-2, 4) if x + y == 3])
+    csp.add_all_different_constraint(['a', 'c', 'd'])
+    return csp
+
+
+def assert_same_csp(csp, loaded):
+    assert loaded.variables == csp.variables
+    assert loaded.domains == csp.domains
+    assert ([constraint.variables
+             for constraint in loaded.all_different_constraints]
+            == [constraint.variables
+                for constraint in csp.all_different_constraints])
+    assert loaded.constraints.keys() == csp.constraints.keys()
+    for (i, constraints) in csp.constraints.items():
+        assert loaded.constraints[i].keys() == constraints.keys()
+        for (j, constraint) in constraints.items():
+            for x in csp.domains[i]:
+                for y in csp.domains[j]:
+                    assert (loaded.constraints[i][j].allows(x, y)
+                            == constraint.allows(x, y)), (i, j, x, y)
+
+
+@pytest.mark.parametrize('build', [sudoku, table_csp, create_map_coloring_csp])
+def test_round_trip(build):
+    csp = build()
+    data = encode_snapshot(csp)
+    loaded = decode_snapshot(data)
+    assert_same_csp(csp, loaded)
+    assert encode_snapshot(loaded) == data
+    expected = build().backtracking_search(bitmask=True, trail=True)
+    assert loaded.backtracking_search(bitmask=True, trail=True) == expected
+    assert decode_snapshot(data).count_solutions() == build().count_solutions()
+
+
+def test_every_engine_solves_a_loaded_csp():
+    data = encode_snapshot(table_csp())
+    expected = table_csp().count_solutions()
+    for options in ({}, {'trail': True}, {'bitmask': True},
+                    {'bitmask': True, 'trail': True, 'gac': True,
+                     'ordering': 'mrv'}):
+        csp = decode_snapshot(data)
+        solution = csp.backtracking_search(**options)
+        assert solution is not None
+        assert_same_csp(table_csp(), csp)
+    assert decode_snapshot(data).count_solutions(gac=True) == expected
+
+
+def test_arc_index_is_built_on_the_first_search():
+    csp = decode_snapshot(encode_snapshot(sudoku()))
+    assert csp.bitmask_gac is None
+    assert csp.backtracking_search(bitmask=True, trail=True, gac=True,
+                                   ordering='mrv') is not None
+    assert csp.bitmask_gac is True
+
+
+def test_files(tmp_path):
+    path = str(tmp_path / 'veryhard.csps')
+    save_snapshot(sudoku(), path)
+    assert_same_csp(sudoku(), load_snapshot(path))
+
+
+def test_errors():
+    with pytest.raises(ValueError):
+        decode_snapshot(b'XXXX' + encode_snapshot(table_csp())[4:])
+    csp = CSP()
+    csp.add_variable('a', [1.5])
+    with pytest.raises(ValueError):
+        encode_snapshot(csp)
@@ -0,0 +1,219 @@
+# Regression checks for the solvers
+#
+# Every solver is run on small random CSPs made of table constraints and
+# Alldiffs, some of them unsatisfiable, and compared with the solutions
+# found by trying every assignment.
+#
+# Run with: python -m pytest csp_code_handout
+
+import itertools
+import random
+
+import pytest
+
+from Assignment import CSP, create_sudoku_csp_from_board
+from dlx import iter_csp_solutions as iter_exact_cover_solutions
+from dlx import solve_csp as solve_exact_cover
+from sat import ENCODINGS
+from sat import solve_csp as solve_sat
+
+
+# Options of backtracking_search
+SEARCH_CONFIGURATIONS = [
+    {},
+    {'trail': True},
+    {'bitmask': True},
+    {'bitmask': True, 'trail': True},
+    {'bitmask': True, 'trail': True, 'incremental': False},
+    {'bitmask': True, 'trail': True, 'ordering': 'mrv'},
+    {'bitmask': True, 'trail': True, 'ordering': 'degree'},
+    {'bitmask': True, 'trail': True, 'ordering': 'mrv/wdeg'},
+    {'bitmask': True, 'gac': True},
+    {'bitmask': True, 'trail': True, 'gac': True, 'ordering': 'mrv'},
+    {'bitmask': True, 'lcv': True},
+    {'bitmask': True, 'trail': True, 'ordering': 'mrv/wdeg', 'lcv': True},
+    {'bitmask': True, 'trail': True, 'learning': True},
+    {'bitmask': True, 'trail': True, 'ordering': 'mrv', 'learning': True},
+    {'bitmask': True, 'trail': True, 'gac': True, 'ordering': 'mrv',
+     'lcv': True, 'learning': True},
+    {'bitmask': True, 'trail': True, 'ordering': 'mrv/wdeg',
+     'restarts': 'luby', 'restart_base': 1, 'seed': 0},
+    {'bitmask': True, 'trail': True, 'ordering': 'mrv', 'learning': True,
+     'restarts': 'luby', 'restart_base': 1, 'seed': 0},
+]
+
+SEEDS = range(100)
+
+
+def random_csp(seed: int, tables: bool = True) -> CSP:
+    """Return a CSP with two to five variables of one to four values,
+    and random table constraints (unless 'tables' is False) and Alldiffs
+    between them."""
+    rng = random.Random(seed)
+    csp = CSP()
+    variables = ['v%d' % k for k in range(rng.randint(2, 5))]
+    for var in variables:
+        csp.add_variable(var, rng.sample(range(5), rng.randint(1, 4)))
+    for (i, j) in itertools.combinations(variables, 2):
+        if tables and rng.random() < 0.4:
+            pairs = [(x, y) for x in csp.domains[i] for y in csp.domains[j]
+                     if rng.random() < 0.6]
+            csp.add_table_constraint(i, j, pairs)
+    for size in (2, 3):
+        if size <= len(variables) and rng.random() < 0.5:
+            csp.add_all_different_constraint(rng.sample(variables, size))
+    return csp
+
+
+def brute_force_solutions(csp: CSP) -> set:
+    """Return every solution of 'csp', as tuples of the values of
+    `csp.variables`."""
+    solutions = set()
+    for values in itertools.product(*(csp.domains[var]
+                                      for var in csp.variables)):
+        assignment = dict(zip(csp.variables, values))
+        if all(constraint.allows(assignment[i], assignment[j])
+               for (i, constraints) in csp.constraints.items()
+               for (j, constraint) in constraints.items()):
+            solutions.add(values)
+    return solutions
+
+
+def as_tuple(csp: CSP, solution: dict) -> tuple:
+    """Return 'solution', in the format of backtracking_search, as a
+    tuple of the values of `csp.variables`."""
+    assert all(len(solution[var]) == 1 for var in csp.variables)
+    return tuple(solution[var][0] for var in csp.variables)
+
+
+def test_corpus_has_unsatisfiable_csps():
+    unsatisfiable = [seed for seed in SEEDS
+                     if not brute_force_solutions(random_csp(seed))]
+    assert 0 < len(unsatisfiable) < len(SEEDS)
+
+
+@pytest.mark.parametrize('options', SEARCH_CONFIGURATIONS, ids=str)
+def test_backtracking_search(options):
+    random.seed(0)
+    for seed in SEEDS:
+        csp = random_csp(seed)
+        solutions = brute_force_solutions(csp)
+        solution = csp.backtracking_search(**options)
+        if solutions:
+            assert solution is not None, seed
+            assert as_tuple(csp, solution) in solutions, seed
+        else:
+            assert solution is None, seed
+
+
+@pytest.mark.parametrize('options', [
+    {'ordering': 'degree'}, {'ordering': 'mrv/wdeg'},
+    {'ordering': 'degree', 'restarts': 'luby', 'restart_base': 1, 'seed': 0},
+    {'ordering': 'mrv/wdeg', 'restarts': 'luby', 'restart_base': 1,
+     'seed': 0}], ids=str)
+def test_ordering_heaps_select_best_score(options):
+    """Every variable taken from a bucket heap has the best score of
+    the smallest bucket, as found by scanning the bucket."""
+    csp = create_sudoku_csp_from_board(
+        ['000000010', '400000000', '020000000', '000050407', '008000300',
+         '001090000', '300400200', '050100000', '000806000'])
+    select = csp.select_unassigned_variable_bitmask
+    selected = []
+
+    def checked_select(masks):
+        var = select(masks)
+        if var is not None:
+            size = masks[var].bit_count()
+            assert size == min(mask.bit_count() for mask in masks
+                               if mask.bit_count() > 1)
+            assert var in csp.buckets[size]
+            scores = csp.bucket_scores
+            assert scores[var] == max(scores[other]
+                                      for other in csp.buckets[size])
+            selected.append(var)
+        return var
+
+    csp.select_unassigned_variable_bitmask = checked_select
+    assert csp.backtracking_search(bitmask=True, trail=True,
+                                   **options) is not None
+    assert len(selected) > 20
+    for heap in csp.bucket_heaps:
+        assert len(heap) <= 2 * len(csp.variables) + 8
+
+
+@pytest.mark.parametrize('options', [{}, {'gac': True, 'ordering': 'mrv'},
+                                     {'ordering': 'mrv/wdeg', 'lcv': True}],
+                         ids=str)
+def test_iter_solutions(options):
+    for seed in SEEDS:
+        csp = random_csp(seed)
+        solutions = [as_tuple(csp, solution)
+                     for solution in csp.iter_solutions(**options)]
+        assert len(solutions) == len(set(solutions)), seed
+        assert set(solutions) == brute_force_solutions(csp), seed
+        assert csp.count_solutions(**options) == len(solutions), seed
+
+
+@pytest.mark.parametrize('encoding', ENCODINGS)
+def test_sat(encoding):
+    for seed in SEEDS:
+        csp = random_csp(seed)
+        solutions = brute_force_solutions(csp)
+        solution = solve_sat(csp, encoding)
+        if solutions:
+            assert solution is not None, seed
+            assert as_tuple(csp, solution) in solutions, seed
+        else:
+            assert solution is None, seed
+
+
+# Sparse boards where the learning search takes hundreds of backtracks
+# or more without an ordering
+SPARSE_BOARDS = [
+    ['000000000', '300000600', '000600000', '000090020', '000000003',
+     '020084060', '060000004', '000000506', '050030000'],
+    ['000070308', '000000000', '000009000', '094502007', '000040002',
+     '000790043', '900607000', '700000004', '050000000']]
+
+
+def test_learning_defaults_to_an_ordering():
+    for board in SPARSE_BOARDS:
+        csp = create_sudoku_csp_from_board(board)
+        solution = csp.backtracking_search(bitmask=True, trail=True,
+                                           learning=True)
+        assert solution is not None
+        assert csp.ordering == CSP.LEARNING_ORDERING
+        assert csp.backtracks < 600
+        explicit = create_sudoku_csp_from_board(board)
+        assert explicit.backtracking_search(
+            bitmask=True, trail=True, learning=True,
+            ordering=CSP.LEARNING_ORDERING) == solution
+        assert explicit.backtracks == csp.backtracks
+    # The default ordering also allows restarts
+    csp = create_sudoku_csp_from_board(SPARSE_BOARDS[0])
+    assert csp.backtracking_search(bitmask=True, trail=True, learning=True,
+                                   restarts='luby', seed=0) is not None
+
+
+def test_exact_cover():
+    for seed in SEEDS:
+        csp = random_csp(seed, tables=False)
+        solutions = brute_force_solutions(csp)
+        solution = solve_exact_cover(csp)
+        if solutions:
+            assert as_tuple(csp, solution) in solutions, seed
+        else:
+            assert solution is None, seed
+        found = [as_tuple(csp, solution)
+                 for solution in iter_exact_cover_solutions(csp)]
+        assert len(found) == len(set(found)), seed
+        assert set(found) == solutions, seed
+
+
+def test_exact_cover_rejects_tables():
+    csp = CSP()
+    csp.add_variable('a', [1, 2])
+    csp.add_variable('b', [1, 2])
+    csp.add_table_constraint('a', 'b', [(1, 2)])
+    with pytest.raises(ValueError):
+        solve_exact_cover(csp)
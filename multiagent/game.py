@@ -23,9 +23,16 @@
 from util import *
 import time
 import os
+import random
 import traceback
 import sys
 
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python 3.9 and older
+    def popcount(bits):
+        return bin(bits).count('1')
+
 #######################
 # Parts worth reading #
 #######################
@@ -80,6 +87,7 @@ class Configuration:
     The convention for positions, like a graph, is that (0,0) is the lower left corner, x increases
     horizontally and y increases vertically.  Therefore, north is the direction of increasing y, or (0,1).
     """
+    __slots__ = ('pos', 'direction')
 
     def __init__(self, pos, direction):
         self.pos = pos
@@ -96,7 +104,7 @@ class Configuration:
         return x == int(x) and y == int(y)
 
     def __eq__(self, other):
-        if other == None:
+        if other is None:
             return False
         return (self.pos == other.pos and self.direction == other.direction)
 
@@ -128,6 +136,8 @@ class AgentState:
     """
     AgentStates hold the state of an agent (configuration, speed, scared, etc).
     """
+    __slots__ = ('start', 'configuration', 'isPacman', 'scaredTimer',
+                 'numCarrying', 'numReturned')
 
     def __init__(self, startConfiguration, isPacman):
         self.start = startConfiguration
@@ -145,7 +155,7 @@ class AgentState:
             return "Ghost: " + str(self.configuration)
 
     def __eq__(self, other):
-        if other == None:
+        if other is None:
             return False
         return self.configuration == other.configuration and self.scaredTimer == other.scaredTimer
 
@@ -153,7 +163,9 @@ class AgentState:
         return hash(hash(self.configuration) + 13 * hash(self.scaredTimer))
 
     def copy(self):
-        state = AgentState(self.start, self.isPacman)
+        state = AgentState.__new__(AgentState)
+        state.start = self.start
+        state.isPacman = self.isPacman
         state.configuration = self.configuration
         state.scaredTimer = self.scaredTimer
         state.numCarrying = self.numCarrying
@@ -169,77 +181,160 @@ class AgentState:
         return self.configuration.getDirection()
 
 
+class GridColumn:
+    """
+    The column x of a Grid, so that grid[x][y] reads and writes the cell
+    (x,y) of the grid.  It behaves like the list of booleans that was the
+    column of the grid before: it can be iterated, sliced and compared to a
+    list, but its length is fixed.
+    """
+    __slots__ = ('grid', 'x')
+
+    def __init__(self, grid, x):
+        self.grid = grid
+        self.x = x
+
+    def __len__(self):
+        return self.grid.height
+
+    def __iter__(self):
+        grid = self.grid
+        bits = grid.bits >> self.x * grid.height
+        for y in range(grid.height):
+            yield bits >> y & 1 == 1
+
+    def __eq__(self, other):
+        if isinstance(other, (GridColumn, list)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __getitem__(self, y):
+        grid = self.grid
+        if isinstance(y, slice):
+            return [self[k] for k in range(*y.indices(grid.height))]
+        if y < 0:
+            y += grid.height
+        if not 0 <= y < grid.height:
+            raise IndexError('grid index out of range')
+        return grid.bits >> (self.x * grid.height + y) & 1 == 1
+
+    def __setitem__(self, y, item):
+        grid = self.grid
+        if isinstance(y, slice):
+            cells = range(*y.indices(grid.height))
+            item = list(item)
+            if len(item) != len(cells):
+                raise ValueError('cannot change the height of a grid')
+            for (k, value) in zip(cells, item):
+                self[k] = value
+            return
+        if y < 0:
+            y += grid.height
+        if not 0 <= y < grid.height:
+            raise IndexError('grid index out of range')
+        bit = 1 << (self.x * grid.height + y)
+        if item:
+            grid.bits |= bit
+        else:
+            grid.bits &= ~bit
+
+
 class Grid:
     """
-    A 2-dimensional array of objects backed by a list of lists.  Data is accessed
-    via grid[x][y] where (x,y) are positions on a Pacman map with x horizontal,
-    y vertical and the origin (0,0) in the bottom left corner.
+    A 2-dimensional array of booleans backed by the bits of an int.  Data is
+    accessed via grid[x][y] where (x,y) are positions on a Pacman map with x
+    horizontal, y vertical and the origin (0,0) in the bottom left corner.
+
+    The cell (x,y) is the bit x * height + y of grid.bits, so copying, hashing,
+    comparing and counting work on whole machine words. Code that reads many
+    cells can test the bits directly.
 
     The __str__ method constructs an output that is oriented like a pacman board.
     """
 
+    CELLS_PER_INT = 30
+
     def __init__(self, width, height, initialValue=False, bitRepresentation=None):
         if initialValue not in [False, True]:
             raise Exception('Grids can only contain booleans')
-        self.CELLS_PER_INT = 30
 
         self.width = width
         self.height = height
-        self.data = [[initialValue for y in range(
-            height)] for x in range(width)]
+        self.bits = (1 << width * height) - 1 if initialValue else 0
+        self._columns = None
         if bitRepresentation:
             self._unpackBits(bitRepresentation)
 
     def __getitem__(self, i):
-        return self.data[i]
+        columns = self._columns
+        if columns is None:
+            columns = [GridColumn(self, x) for x in range(self.width)]
+            self._columns = columns
+        return columns[i]
 
     def __setitem__(self, key, item):
-        self.data[key] = item
+        column = self[key]
+        for y in range(self.height):
+            column[y] = item[y]
 
     def __str__(self):
-        out = [[str(self.data[x][y])[0] for x in range(self.width)]
+        out = [[str(self[x][y])[0] for x in range(self.width)]
                for y in range(self.height)]
         out.reverse()
         return '\n'.join([''.join(x) for x in out])
 
     def __eq__(self, other):
-        if other == None:
+        if other is None:
             return False
-        return self.data == other.data
+        return (self.bits == other.bits and self.width == other.width
+                and self.height == other.height)
 
     def __hash__(self):
-        # return hash(str(self))
-        base = 1
-        h = 0
-        for l in self.data:
-            for i in l:
-                if i:
-                    h += base
-                base *= 2
-        return hash(h)
+        return hash(self.bits)
 
     def copy(self):
-        g = Grid(self.width, self.height)
-        g.data = [x[:] for x in self.data]
+        g = Grid.__new__(Grid)
+        g.width = self.width
+        g.height = self.height
+        g.bits = self.bits
+        g._columns = None
         return g
 
     def deepCopy(self):
         return self.copy()
 
     def shallowCopy(self):
-        g = Grid(self.width, self.height)
-        g.data = self.data
-        return g
+        """
+        Returns a grid that shares its cells with this one, so that writes
+        to either are seen by both.  With the cells in a single int, that
+        is this grid itself.
+        """
+        return self
 
     def count(self, item=True):
-        return sum([x.count(item) for x in self.data])
+        if item == True:
+            return popcount(self.bits)
+        if item == False:
+            return self.width * self.height - popcount(self.bits)
+        return 0
 
     def asList(self, key=True):
+        bits = self.bits
+        if key == False:
+            bits ^= (1 << self.width * self.height) - 1
+        elif key != True:
+            return []
+        height = self.height
         list = []
-        for x in range(self.width):
-            for y in range(self.height):
-                if self[x][y] == key:
-                    list.append((x, y))
+        while bits:
+            low = bits & -bits
+            list.append(divmod(low.bit_length() - 1, height))
+            bits ^= low
         return list
 
     def packBits(self):
@@ -252,8 +347,7 @@ class Grid:
         currentInt = 0
         for i in range(self.height * self.width):
             bit = self.CELLS_PER_INT - (i % self.CELLS_PER_INT) - 1
-            x, y = self._cellIndexToPosition(i)
-            if self[x][y]:
+            if self.bits >> i & 1:
                 currentInt += 2 ** bit
             if (i + 1) % self.CELLS_PER_INT == 0:
                 bits.append(currentInt)
@@ -262,7 +356,7 @@ class Grid:
         return tuple(bits)
 
     def _cellIndexToPosition(self, index):
-        x = index / self.height
+        x = index // self.height
         y = index % self.height
         return x, y
 
@@ -358,11 +452,12 @@ class Actions:
         if (abs(x - x_int) + abs(y - y_int) > Actions.TOLERANCE):
             return [config.getDirection()]
 
+        bits, height = walls.bits, walls.height
         for dir, vec in Actions._directionsAsList:
             dx, dy = vec
             next_y = y_int + dy
             next_x = x_int + dx
-            if not walls[next_x][next_y]:
+            if not bits >> (next_x * height + next_y) & 1:
                 possible.append(dir)
 
         return possible
@@ -381,7 +476,7 @@ class Actions:
             next_y = y_int + dy
             if next_y < 0 or next_y == walls.height:
                 continue
-            if not walls[next_x][next_y]:
+            if not walls.bits >> (next_x * walls.height + next_y) & 1:
                 neighbors.append((next_x, next_y))
         return neighbors
     getLegalNeighbors = staticmethod(getLegalNeighbors)
@@ -393,19 +488,67 @@ class Actions:
     getSuccessor = staticmethod(getSuccessor)
 
 
+# Random 64-bit keys of the features of a game state, made on first use by a
+# generator of their own so that the game's random numbers stay the same
+_zobristRandom = random.Random(188)
+_zobristKeys = {}
+_SCORE_MULTIPLIER = 0x9E3779B97F4A7C15
+_HASH_MASK = (1 << 64) - 1
+
+
+def zobristKey(feature):
+    """
+    Returns the random 64-bit key of a feature of a game state, such as
+    ('food', (x, y)).  The Zobrist hash of a state is the xor of the keys of
+    its features.
+    """
+    key = _zobristKeys.get(feature)
+    if key is None:
+        key = _zobristKeys[feature] = _zobristRandom.getrandbits(64)
+    return key
+
+
+def agentStateKey(agentIndex, agentState):
+    """
+    Returns the Zobrist key of the configuration and scared timer of an agent.
+    """
+    configuration = agentState.configuration
+    if configuration is None:
+        key = zobristKey(('agent', agentIndex, None, None))
+    else:
+        key = zobristKey(('agent', agentIndex, configuration.pos,
+                          configuration.direction))
+    return key ^ zobristKey(('scared', agentIndex, agentState.scaredTimer))
+
+
 class GameStateData:
+    """
+    The data of a game state. A successor shares the food grid, the capsule
+    list, the _eaten list and the agent states of its predecessor, so the
+    rules must replace them rather than change them: the food grid and the
+    lists by copies, and an agent state by copyAgentState.
+
+    zobrist is the xor of the Zobrist keys of the food, the capsules and the
+    agent states.  It is computed once by initialize and then updated from the
+    changes of every move by updateHash, so hashing a state takes constant
+    time.
+    """
+    __slots__ = ('food', 'capsules', 'agentStates', 'layout', '_eaten',
+                 'score', '_foodEaten', '_foodAdded', '_capsuleEaten',
+                 '_agentMoved', '_lose', '_win', 'scoreChange', 'zobrist')
 
     def __init__(self, prevState=None):
         """
         Generates a new data packet by copying information from its predecessor.
         """
-        if prevState != None:
-            self.food = prevState.food.shallowCopy()
-            self.capsules = prevState.capsules[:]
-            self.agentStates = self.copyAgentStates(prevState.agentStates)
+        if prevState is not None:
+            self.food = prevState.food
+            self.capsules = prevState.capsules
+            self.agentStates = prevState.agentStates[:]
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
+            self.zobrist = prevState.zobrist
 
         self._foodEaten = None
         self._foodAdded = None
@@ -418,6 +561,9 @@ class GameStateData:
     def deepCopy(self):
         state = GameStateData(self)
         state.food = self.food.deepCopy()
+        state.capsules = self.capsules[:]
+        state.agentStates = self.copyAgentStates(self.agentStates)
+        state._eaten = self._eaten[:]
         state.layout = self.layout.deepCopy()
         state._agentMoved = self._agentMoved
         state._foodEaten = self._foodEaten
@@ -431,13 +577,55 @@ class GameStateData:
             copiedStates.append(agentState.copy())
         return copiedStates
 
+    def copyAgentState(self, agentIndex):
+        """
+        Replaces the state of the agent by a copy that is not shared with the
+        predecessors of this state, and returns it for the rules to change.
+        """
+        agentState = self.agentStates[agentIndex].copy()
+        self.agentStates[agentIndex] = agentState
+        return agentState
+
+    def computeHash(self):
+        """
+        Returns the Zobrist hash of the food, capsules and agent states.
+        """
+        zobrist = 0
+        for position in self.food.asList():
+            zobrist ^= zobristKey(('food', position))
+        for position in self.capsules:
+            zobrist ^= zobristKey(('capsule', position))
+        for agentIndex, agentState in enumerate(self.agentStates):
+            zobrist ^= agentStateKey(agentIndex, agentState)
+        return zobrist
+
+    def updateHash(self, prevState):
+        """
+        Updates the hash copied from prevState with the changes of a move: the
+        eaten food and capsule, and the agent states the rules replaced.
+        """
+        zobrist = self.zobrist
+        if self._foodEaten is not None:
+            zobrist ^= zobristKey(('food', self._foodEaten))
+        if self._capsuleEaten is not None:
+            zobrist ^= zobristKey(('capsule', self._capsuleEaten))
+        prevAgentStates = prevState.agentStates
+        for agentIndex, agentState in enumerate(self.agentStates):
+            prevAgentState = prevAgentStates[agentIndex]
+            if agentState is not prevAgentState:
+                zobrist ^= (agentStateKey(agentIndex, prevAgentState)
+                            ^ agentStateKey(agentIndex, agentState))
+        self.zobrist = zobrist
+
     def __eq__(self, other):
         """
         Allows two states to be compared.
         """
-        if other == None:
+        if other is None:
             return False
         # TODO Check for type of other
+        if self.zobrist != other.zobrist:
+            return False
         if not self.agentStates == other.agentStates:
             return False
         if not self.food == other.food:
@@ -452,17 +640,11 @@ class GameStateData:
         """
         Allows states to be keys of dictionaries.
         """
-        for i, state in enumerate(self.agentStates):
-            try:
-                int(hash(state))
-            except TypeError as e:
-                print(e)
-                # hash(state)
-        return int((hash(tuple(self.agentStates)) + 13*hash(self.food) + 113 * hash(tuple(self.capsules)) + 7 * hash(self.score)) % 1048575)
+        return self.zobrist ^ (int(self.score) * _SCORE_MULTIPLIER & _HASH_MASK)
 
     def __str__(self):
         width, height = self.layout.width, self.layout.height
-        map = Grid(width, height)
+        map = [[None] * height for x in range(width)]
         if type(self.food) == type((1, 2)):
             self.food = reconstituteGrid(self.food)
         for x in range(width):
@@ -485,7 +667,9 @@ class GameStateData:
         for x, y in self.capsules:
             map[x][y] = 'o'
 
-        return str(map) + ("\nScore: %d\n" % self.score)
+        rows = [''.join([map[x][y] for x in range(width)])
+                for y in range(height - 1, -1, -1)]
+        return '\n'.join(rows) + ("\nScore: %d\n" % self.score)
 
     def _foodWallStr(self, hasFood, hasWall):
         if hasFood:
@@ -536,6 +720,7 @@ class GameStateData:
             self.agentStates.append(AgentState(
                 Configuration(pos, Directions.STOP), isPacman))
         self._eaten = [False for a in self.agentStates]
+        self.zobrist = self.computeHash()
 
 
 try:
@@ -19,8 +19,10 @@ import numbers
 from operator import truediv
 from util import manhattanDistance
 from game import Directions
+from game import Actions
 import random, util
 import math
+import time
 
 from game import Agent
 
@@ -92,6 +94,88 @@ def scoreEvaluationFunction(currentGameState):
     """
     return currentGameState.getScore()
 
+# Flags of the values stored in a TranspositionTable
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+class TranspositionTable:
+    """
+    A bounded table of the values of searched states, so that a state reached
+    again through another order of moves is not searched again.
+
+    An entry is keyed by a state and the agent to move, and holds the number
+    of plies left, the value of the state, whether that value is EXACT or only
+    a LOWER_BOUND or UPPER_BOUND (when an alpha-beta search of the state was
+    cut off), and the best action found.
+
+    Every search of an iterative deepening starts a new generation of the
+    table with newSearch.  Values are only looked up for the plies left and
+    the generation they were stored with, but the best action of an older or
+    deeper search of the state is kept to search it first.
+
+    The table has 'size' buckets of two entries, picked by the hash of the key.
+    The first entry of a bucket keeps the state of the latest generation
+    searched deepest, which is the most expensive to search again; the second
+    one keeps the last entry that did not replace the first.
+    """
+
+    def __init__(self, size=65536):
+        self.size = size
+        self.clear()
+
+    def clear(self):
+        self.entries = [None] * (2 * self.size)
+        self.generation = 0
+        self.hits = 0
+
+    def newSearch(self):
+        self.generation += 1
+
+    def lookup(self, state, agentIndex, depth):
+        """
+        Returns the (flag, value, action) stored for the state by this
+        generation with depth plies left, or None.
+        """
+        key = (state, agentIndex)
+        index = 2 * (hash(key) % self.size)
+        for entry in (self.entries[index], self.entries[index + 1]):
+            if (entry is not None and entry[0] == key and entry[1] == depth
+                    and entry[2] == self.generation):
+                self.hits += 1
+                return entry[3:]
+        return None
+
+    def bestAction(self, state, agentIndex):
+        """
+        Returns the best action stored for the state, whatever the plies left
+        and the generation, or None.
+        """
+        key = (state, agentIndex)
+        index = 2 * (hash(key) % self.size)
+        for entry in (self.entries[index], self.entries[index + 1]):
+            if entry is not None and entry[0] == key:
+                return entry[5]
+        return None
+
+    def store(self, state, agentIndex, depth, flag, value, action):
+        key = (state, agentIndex)
+        index = 2 * (hash(key) % self.size)
+        entry = (key, depth, self.generation, flag, value, action)
+        first = self.entries[index]
+        if first is None or (first[2], first[1]) <= (self.generation, depth):
+            if first is not None and first[:2] != (key, depth):
+                self.entries[index + 1] = first
+            self.entries[index] = entry
+        else:
+            self.entries[index + 1] = entry
+
+class SearchTimeout(Exception):
+    """
+    Raised by a search that passed the deadline of the move.
+    """
+    pass
+
 class MultiAgentSearchAgent(Agent):
     """
     This class provides some common elements to all of your
@@ -105,12 +189,145 @@ class MultiAgentSearchAgent(Agent):
     Note: this is an abstract class: one that should not be instantiated.  It's
     only partially specified, and designed to be extended.  Agent (game.py)
     is another abstract class.
+
+    The searchers can share a TranspositionTable of tableSize buckets, emptied
+    before searching for a move.  It is off with the default tableSize of 0.
+
+    With a timeLimit of 0 the searchers search self.depth plies.  Otherwise
+    they deepen their search one ply at a time until timeLimit seconds have
+    passed, see iterativeDeepening; keep it below the move timeout of the game.
+
+    The searchers only use the table and the time limit in the searches they
+    run when extendedSearch() is True, and keep their own search otherwise.
     """
 
-    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2'):
+    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2', tableSize = '0', timeLimit = '0'):
         self.index = 0 # Pacman is always agent index 0
         self.evaluationFunction = util.lookup(evalFn, globals())
         self.depth = int(depth)
+        self.table = None
+        if int(tableSize) > 0:
+            self.table = TranspositionTable(int(tableSize))
+        self.timeLimit = float(timeLimit)
+        self.deadline = None
+        self.rootState = None
+        self.rootMove = None
+        self.rootValue = None
+        self.rootActions = []
+        self.depthLimited = False
+        self.rootDepth = 0
+        self.searchedDepth = 0
+
+    def extendedSearch(self):
+        """
+        Returns whether the transposition table or the time limit is on.
+        """
+        return self.table is not None or self.timeLimit > 0
+
+    def startSearch(self):
+        """
+        Starts a new generation of the transposition table before every search
+        of iterativeDeepening.
+        """
+        if self.table is not None:
+            self.table.newSearch()
+        self.depthLimited = False
+
+    def iterativeDeepening(self, gameState, search):
+        """
+        Returns the best action of Pacman in gameState.  search(state, 0, depth)
+        must return the value of the state and the best action of Pacman when
+        searching depth plies.
+
+        Without a time limit this is a single search of self.depth plies.
+        Otherwise the search goes 1, 2, 3... plies deep, starting with the best
+        action of the previous depth, until the time limit is passed or a
+        search reached the end of the game on every branch.  The action of the
+        deepest completed search is returned; the search of 1 ply always
+        completes.  The depth reached is left in self.searchedDepth and the
+        value of the state found at that depth in self.rootValue.
+        """
+        if self.table is not None:
+            self.table.clear()
+        self.rootState = gameState
+        self.rootActions = gameState.getLegalActions(0)
+        self.rootMove = self.rootValue = None
+        try:
+            if self.timeLimit <= 0:
+                self.startSearch()
+                self.rootDepth = self.searchedDepth = self.depth
+                self.rootValue, self.rootMove = search(gameState, 0, self.depth)
+                return self.rootMove
+
+            deadline = time.time() + self.timeLimit
+            depth = 1
+            while True:
+                self.startSearch()
+                self.rootDepth = depth
+                try:
+                    value, move = search(gameState, 0, depth)
+                except SearchTimeout:
+                    break
+                self.rootValue, self.rootMove = value, move
+                self.searchedDepth = depth
+                if not self.depthLimited:
+                    break
+                self.deadline = deadline
+                depth += 1
+            return self.rootMove
+        finally:
+            self.deadline = None
+            self.rootState = None
+
+    def searchActions(self, state, agentIndex, depth):
+        """
+        Returns the actions to search from the state, in the order to search
+        them: none when the state is a leaf, the best action of the previous
+        depth first at the root.  Raises SearchTimeout when the deadline of the
+        move has passed.
+        """
+        if self.isLeaf(state, depth):
+            if depth == 0 and not (state.isWin() or state.isLose()):
+                self.depthLimited = True
+            return []
+        if self.deadline is not None and time.time() > self.deadline:
+            raise SearchTimeout()
+        actions = state.getLegalActions(agentIndex)
+        if state is self.rootState and self.rootMove in actions:
+            actions.remove(self.rootMove)
+            actions.insert(0, self.rootMove)
+        return actions
+
+    def firstAtRoot(self, state, action, bestMove):
+        """
+        Returns whether action comes before bestMove in the legal actions of
+        the root state, so that an action tied for the best value at the root
+        does not depend on the order the actions were searched in.
+        """
+        return (state is self.rootState
+                and self.rootActions.index(action) < self.rootActions.index(bestMove))
+
+    def lookup(self, state, agentIndex, depth):
+        if self.table is None:
+            return None
+        return self.table.lookup(state, agentIndex, depth)
+
+    def store(self, state, agentIndex, depth, flag, value, action):
+        if self.table is not None:
+            self.table.store(state, agentIndex, depth, flag, value, action)
+
+    def isLeaf(self, state, depth):
+        return depth == 0 or state.isWin() or state.isLose()
+
+    def nextTurn(self, state, agentIndex, depth):
+        """
+        Returns the agent that moves after agentIndex and the number of plies
+        left then: a ply ends when the last ghost has moved.
+        """
+        agentIndex += 1
+        if agentIndex == state.getNumAgents():
+            return 0, depth - 1
+        return agentIndex, depth
 
 class MinimaxAgent(MultiAgentSearchAgent):
     """
@@ -142,6 +359,9 @@ class MinimaxAgent(MultiAgentSearchAgent):
         gameState.isLose():
         Returns whether or not the game state is a losing state
         """
+        if self.extendedSearch():
+            return self.iterativeDeepening(gameState, self.minimaxValue)
+
         ## pacman maximizing - true - looking at next states picks the one with the maximum score
         ## ghosts minimizing - false - looking at next states picks the one with the minimum score 
 
@@ -183,8 +403,9 @@ class MinimaxAgent(MultiAgentSearchAgent):
                 legalGhostActions = state.getLegalActions(n)
                 for action in legalGhostActions: 
                     successorState = state.generateSuccessor(n, action)
-                    if self.miniMax(successorState, depth, False) > bestScore: 
-                        bestScore = self.miniMax(successorState, depth, False)
+                    score = self.miniMax(successorState, depth, False)
+                    if score > bestScore: 
+                        bestScore = score
                       
             
             return bestScore
@@ -201,21 +422,71 @@ class MinimaxAgent(MultiAgentSearchAgent):
 
             return bestScore
 
-
-            
-
+    def minimaxValue(self, state, agentIndex, depth):
+        """
+        Returns the minimax value of the state when agentIndex moves with depth
+        plies left, and the best action of agentIndex.  Pacman maximizes the
+        value and the ghosts minimize it.  This is the search of getAction when
+        extendedSearch() is True.
+        """
+        actions = self.searchActions(state, agentIndex, depth)
+        if not actions:
+            return self.evaluationFunction(state), None
+        entry = self.lookup(state, agentIndex, depth)
+        if entry is not None:
+            return entry[1], entry[2]
+
+        nextAgent, nextDepth = self.nextTurn(state, agentIndex, depth)
+        bestScore, bestMove = None, None
+        for action in actions:
+            successorState = state.generateSuccessor(agentIndex, action)
+            score = self.minimaxValue(successorState, nextAgent, nextDepth)[0]
+            if (bestMove is None or (score > bestScore if agentIndex == 0 else score < bestScore)
+                    or (score == bestScore and self.firstAtRoot(state, action, bestMove))):
+                bestScore, bestMove = score, action
+
+        self.store(state, agentIndex, depth, EXACT, bestScore, bestMove)
+        return bestScore, bestMove
 
 
 class AlphaBetaAgent(MultiAgentSearchAgent):
     """
     Your minimax agent with alpha-beta pruning (question 3)
+
+    Alpha-beta cuts off more of the search when the best actions are searched
+    first.  With ordering=True the actions of a state are searched in this
+    order: the best action stored for the state in the transposition table by
+    a search of any depth (the principal variation, when the table is on), the
+    killer actions that caused the last cutoffs at the same ply, the actions
+    with the highest history score, which grows with every cutoff an action
+    causes from the same position, and then the actions that look best from
+    the food and ghosts next to them.  Neither the values nor the action
+    chosen change, since a tie at the root goes to the first legal action.
+
+    The killers are forgotten after every move.  The history scores are halved
+    instead, and dropped when they reach 0.
     """
 
+    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2', tableSize = '0', timeLimit = '0', ordering = 'False'):
+        MultiAgentSearchAgent.__init__(self, evalFn, depth, tableSize, timeLimit)
+        self.ordering = str(ordering) in ('True', '1')
+        self.killers = {}
+        self.history = {}
+
+    def extendedSearch(self):
+        return self.ordering or MultiAgentSearchAgent.extendedSearch(self)
+
     def getAction(self, gameState):
         """
         Returns the minimax action using self.depth and self.evaluationFunction
         """
         "*** YOUR CODE HERE ***"
+        if self.extendedSearch():
+            if self.ordering:
+                self.killers = {}
+                self.history = {key: score // 2 for key, score in self.history.items()
+                                if score > 1}
+            return self.iterativeDeepening(gameState, self.alphaBeta)
 
 
         bestScore = -10000000
@@ -304,6 +575,120 @@ class AlphaBetaAgent(MultiAgentSearchAgent):
 
         return value
 
+    def alphaBeta(self, state, agentIndex, depth, alpha=-math.inf, beta=math.inf):
+        """
+        Returns the minimax value of the state when agentIndex moves with depth
+        plies left, and the best action of agentIndex.  The search of a state
+        is cut off as soon as its value is known to be above beta (for Pacman)
+        or below alpha (for a ghost), and the value returned is then only a
+        bound.
+        """
+        actions = self.searchActions(state, agentIndex, depth)
+        if not actions:
+            return self.evaluationFunction(state), None
+        entry = self.lookup(state, agentIndex, depth)
+        if entry is not None:
+            flag, value, action = entry
+            if (flag == EXACT or (flag == LOWER_BOUND and value > beta)
+                    or (flag == UPPER_BOUND and value < alpha)):
+                return value, action
+        if self.ordering and len(actions) > 1:
+            actions = self.orderActions(state, agentIndex, depth, actions)
+
+        nextAgent, nextDepth = self.nextTurn(state, agentIndex, depth)
+        bestScore, bestMove = None, None
+        lower, upper = alpha, beta
+        for action in actions:
+            successorState = state.generateSuccessor(agentIndex, action)
+            score = self.alphaBeta(successorState, nextAgent, nextDepth, lower, upper)[0]
+            if agentIndex == 0:
+                if (bestMove is None or score > bestScore
+                        or (score == bestScore and self.firstAtRoot(state, action, bestMove))):
+                    bestScore, bestMove = score, action
+                if bestScore > beta:
+                    break
+                lower = max(lower, bestScore)
+            else:
+                if bestMove is None or score < bestScore:
+                    bestScore, bestMove = score, action
+                if bestScore < alpha:
+                    break
+                upper = min(upper, bestScore)
+
+        if bestScore > beta:
+            flag = LOWER_BOUND
+        elif bestScore < alpha:
+            flag = UPPER_BOUND
+        else:
+            flag = EXACT
+        if self.ordering and flag == (LOWER_BOUND if agentIndex == 0 else UPPER_BOUND):
+            self.recordCutoff(state, agentIndex, depth, bestMove)
+        self.store(state, agentIndex, depth, flag, bestScore, bestMove)
+        return bestScore, bestMove
+
+    def agentPosition(self, state, agentIndex):
+        if agentIndex == 0:
+            return state.getPacmanPosition()
+        return state.getGhostPosition(agentIndex)
+
+    def orderActions(self, state, agentIndex, depth, actions):
+        """
+        Returns the actions sorted best first, see the class docstring.
+        """
+        bestMove = None
+        if self.table is not None:
+            bestMove = self.table.bestAction(state, agentIndex)
+        killers = self.killers.get((self.rootDepth - depth, agentIndex), ())
+        position = self.agentPosition(state, agentIndex)
+        history = self.history
+        staticScores = self.staticScores(state, agentIndex, position, actions)
+
+        def priority(index):
+            action = actions[index]
+            return (action == bestMove, action in killers,
+                    history.get((agentIndex, position, action), 0),
+                    staticScores[index])
+        order = sorted(range(len(actions)), key=priority, reverse=True)
+        return [actions[index] for index in order]
+
+    def staticScores(self, state, agentIndex, position, actions):
+        """
+        Returns a cheap guess of how good each action is for agentIndex, from
+        the square it leads to: Pacman wants food and no ghost next to it, a
+        ghost wants to get close to Pacman unless it is scared.
+        """
+        scores = []
+        if agentIndex == 0:
+            ghosts = [ghost.getPosition() for ghost in state.getGhostStates()
+                      if ghost.scaredTimer == 0]
+            for action in actions:
+                x, y = Actions.getSuccessor(position, action)
+                score = 1 if state.hasFood(int(x), int(y)) else 0
+                for ghost in ghosts:
+                    if manhattanDistance(ghost, (x, y)) <= 1:
+                        score -= 2
+                if action == Directions.STOP:
+                    score -= 1
+                scores.append(score)
+        else:
+            pacmanPosition = state.getPacmanPosition()
+            scared = state.getGhostState(agentIndex).scaredTimer > 0
+            for action in actions:
+                distance = manhattanDistance(Actions.getSuccessor(position, action), pacmanPosition)
+                scores.append(distance if scared else -distance)
+        return scores
+
+    def recordCutoff(self, state, agentIndex, depth, action):
+        """
+        Makes the action that cut off the search of the state a killer at its
+        ply and raises its history score.
+        """
+        ply = (self.rootDepth - depth, agentIndex)
+        killers = self.killers.get(ply, [])
+        if action not in killers:
+            self.killers[ply] = [action] + killers[:1]
+        key = (agentIndex, self.agentPosition(state, agentIndex), action)
+        self.history[key] = self.history.get(key, 0) + depth * depth
 
 class ExpectimaxAgent(MultiAgentSearchAgent):
     """
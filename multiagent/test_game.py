@@ -0,0 +1,176 @@
+# Regression checks for the Grid of game.py
+#
+# The Grid keeps its cells in the bits of an int.  It is compared on random
+# grids with the list of lists it replaced, which is copied below.
+#
+# Run with: python -m pytest multiagent/test_game.py
+
+import random
+
+import pytest
+
+from game import Grid, reconstituteGrid
+
+
+class ListGrid:
+    """The Grid of game.py as it was, backed by a list of lists."""
+
+    def __init__(self, width, height, initialValue=False):
+        self.width = width
+        self.height = height
+        self.data = [[initialValue for y in range(height)] for x in range(width)]
+
+    def __getitem__(self, i):
+        return self.data[i]
+
+    def __setitem__(self, key, item):
+        self.data[key] = item
+
+    def __str__(self):
+        out = [[str(self.data[x][y])[0] for x in range(self.width)]
+               for y in range(self.height)]
+        out.reverse()
+        return '\n'.join([''.join(x) for x in out])
+
+    def __eq__(self, other):
+        if other == None:
+            return False
+        return self.data == other.data
+
+    def __hash__(self):
+        base = 1
+        h = 0
+        for l in self.data:
+            for i in l:
+                if i:
+                    h += base
+                base *= 2
+        return hash(h)
+
+    def copy(self):
+        g = ListGrid(self.width, self.height)
+        g.data = [x[:] for x in self.data]
+        return g
+
+    def shallowCopy(self):
+        g = ListGrid(self.width, self.height)
+        g.data = self.data
+        return g
+
+    def count(self, item=True):
+        return sum([x.count(item) for x in self.data])
+
+    def asList(self, key=True):
+        list = []
+        for x in range(self.width):
+            for y in range(self.height):
+                if self[x][y] == key:
+                    list.append((x, y))
+        return list
+
+
+def random_grids(seed, width, height):
+    """Returns a Grid and a ListGrid with the same random cells."""
+    rng = random.Random(seed)
+    initialValue = rng.random() < 0.5
+    grid = Grid(width, height, initialValue)
+    old = ListGrid(width, height, initialValue)
+    for k in range(rng.randrange(width * height + 1)):
+        x = rng.randrange(width)
+        y = rng.randrange(height)
+        value = rng.random() < 0.5
+        grid[x][y] = value
+        old[x][y] = value
+    return grid, old
+
+
+def assert_same(grid, old):
+    assert str(grid) == str(old)
+    assert hash(grid) == hash(old)
+    for key in (True, False, 1, 0, None):
+        assert grid.asList(key) == old.asList(key), key
+        assert grid.count(key) == old.count(key), key
+    assert grid.asList() == old.asList()
+    assert grid.count() == old.count()
+    for x in range(-grid.width, grid.width):
+        column = grid[x]
+        assert len(column) == len(old[x])
+        assert list(column) == old[x]
+        assert column == old[x] and old[x] == column
+        assert (True in column) == (True in old[x])
+        for y in range(-grid.height, grid.height):
+            assert column[y] == old[x][y]
+        for cells in (slice(None), slice(1, None), slice(None, -1),
+                      slice(None, None, 2), slice(None, None, -1),
+                      slice(-3, 100)):
+            assert column[cells] == old[x][cells], cells
+
+
+SIZES = [(1, 1), (3, 5), (7, 3), (20, 11), (28, 9)]
+
+
+@pytest.mark.parametrize('width,height', SIZES)
+def test_same_as_list_grid(width, height):
+    for seed in range(20):
+        grid, old = random_grids(seed, width, height)
+        assert_same(grid, old)
+        assert reconstituteGrid(grid.packBits()) == grid
+
+
+@pytest.mark.parametrize('width,height', SIZES)
+def test_equality(width, height):
+    for seed in range(10):
+        grid, old = random_grids(seed, width, height)
+        other, otherOld = random_grids(seed + 1, width, height)
+        assert (grid == other) == (old == otherOld)
+        assert grid == grid.copy() and old == old.copy()
+        assert grid != None and not (old == None)
+        assert grid != Grid(width + 1, height) and grid != Grid(width, height + 1)
+        assert grid[0] != grid[0][:] + [False]
+        assert grid[0] != tuple(grid[0])
+
+
+@pytest.mark.parametrize('width,height', SIZES)
+def test_copies(width, height):
+    for seed in range(10):
+        grid, old = random_grids(seed, width, height)
+        x = seed % width
+        y = seed % height
+        value = not grid[x][y]
+
+        # A copy is independent of the grid it was made from
+        for (copy, oldCopy) in ((grid.copy(), old.copy()),
+                                (grid.deepCopy(), old.copy())):
+            copy[x][y] = value
+            oldCopy[x][y] = value
+            assert_same(copy, oldCopy)
+            assert_same(grid, old)
+            assert copy != grid
+
+        # A shallow copy shares its cells
+        shallow = grid.shallowCopy()
+        oldShallow = old.shallowCopy()
+        shallow[x][y] = value
+        oldShallow[x][y] = value
+        assert_same(shallow, oldShallow)
+        assert_same(grid, old)
+        assert grid[x][y] == value and shallow == grid
+
+
+def test_column_writes():
+    grid, old = random_grids(0, 4, 6)
+    grid[1][::2] = [True, False, True]
+    old[1][::2] = [True, False, True]
+    grid[2][-2:] = iter([False, True])
+    old[2][-2:] = [False, True]
+    grid[3] = [True] * 6
+    old[3] = [True] * 6
+    assert_same(grid, old)
+    with pytest.raises(ValueError):
+        grid[1][1:3] = [True]
+    with pytest.raises(IndexError):
+        grid[0][6]
+    with pytest.raises(IndexError):
+        grid[0][-7] = True
+    with pytest.raises(TypeError):
+        hash(grid[0])
@@ -0,0 +1,185 @@
+# Regression checks for the search extensions of multiAgents.py
+#
+# The transposition table must not change the values found by the searches,
+# whatever bounds it stores and however its buckets are replaced.  The score
+# alone gives most states the same value, so that a bound is almost always
+# exact; the searches are checked with an evaluation that spreads the values.
+#
+# Run with: python -m pytest multiagent/test_multiAgents.py
+
+import os
+import random
+import zlib
+
+import pytest
+
+import layout
+import pacman
+from multiAgents import (EXACT, LOWER_BOUND, UPPER_BOUND, AlphaBetaAgent,
+                         MinimaxAgent, TranspositionTable)
+
+# Small layouts, and the depth they are searched to
+LAYOUTS = (('minimaxClassic', 3), ('trappedClassic', 3), ('testClassic', 3),
+           ('smallClassic', 2))
+
+
+def load_layout(name):
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'layouts', name + '.lay')
+    with open(path) as f:
+        return layout.Layout([line.strip() for line in f])
+
+
+def game_states(name, count=6, seed=0):
+    """Returns the first states of a random game on the layout."""
+    rng = random.Random(seed)
+    state = pacman.GameState()
+    state.initialize(load_layout(name), 4)
+    states = []
+    agent = 0
+    while len(states) < count and not (state.isWin() or state.isLose()):
+        if agent == 0:
+            states.append(state)
+        state = state.generateSuccessor(agent, rng.choice(state.getLegalActions(agent)))
+        agent = (agent + 1) % state.getNumAgents()
+    return states
+
+
+def spread_evaluation(state):
+    """Returns the score of the state plus a number from 0 to 60 that
+    depends on the whole state."""
+    return state.getScore() + zlib.crc32(str(state).encode()) % 61
+
+
+def make_agent(agentClass, depth, **options):
+    agent = agentClass(depth=str(depth), **options)
+    agent.evaluationFunction = spread_evaluation
+    return agent
+
+
+def search_value(agent, search, state):
+    """Returns the value of the state and the action found by search."""
+    action = agent.iterativeDeepening(state, search)
+    return agent.rootValue, action
+
+
+def test_table_is_off_by_default():
+    for agent in (MinimaxAgent(), AlphaBetaAgent()):
+        assert agent.table is None
+        assert not agent.extendedSearch()
+    assert MinimaxAgent(tableSize='16').extendedSearch()
+
+
+def test_bucket_replacement():
+    table = TranspositionTable(1)
+    table.store('a', 0, 2, EXACT, 1, 'North')
+    table.store('b', 0, 1, EXACT, 2, 'South')
+    assert table.lookup('a', 0, 2) == (EXACT, 1, 'North')
+    assert table.lookup('b', 0, 1) == (EXACT, 2, 'South')
+
+    # A deeper entry takes the first place, and the first one moves down
+    table.store('c', 0, 3, LOWER_BOUND, 3, 'East')
+    assert table.lookup('c', 0, 3) == (LOWER_BOUND, 3, 'East')
+    assert table.lookup('a', 0, 2) == (EXACT, 1, 'North')
+    assert table.lookup('b', 0, 1) is None
+
+    # A shallower entry replaces the second one
+    table.store('d', 0, 1, UPPER_BOUND, 4, 'West')
+    assert table.lookup('d', 0, 1) == (UPPER_BOUND, 4, 'West')
+    assert table.lookup('c', 0, 3) == (LOWER_BOUND, 3, 'East')
+    assert table.lookup('a', 0, 2) is None
+
+    # The same key is updated in place
+    table.store('c', 0, 3, EXACT, 5, 'North')
+    assert table.lookup('c', 0, 3) == (EXACT, 5, 'North')
+    assert table.lookup('d', 0, 1) == (UPPER_BOUND, 4, 'West')
+
+    # Values are only found for the agent to move and the plies left they
+    # were stored with, but the best action is found for any plies left
+    assert table.lookup('c', 1, 3) is None
+    assert table.lookup('c', 0, 2) is None
+    assert table.bestAction('c', 0) == 'North'
+    assert table.bestAction('c', 1) is None
+
+
+def test_generations():
+    table = TranspositionTable(1)
+    table.store('a', 0, 3, EXACT, 1, 'North')
+    table.newSearch()
+    # The values of an earlier search are not used, its actions are
+    assert table.lookup('a', 0, 3) is None
+    assert table.bestAction('a', 0) == 'North'
+    # The latest search takes the first place even when it is shallower
+    table.store('b', 0, 1, EXACT, 2, 'South')
+    table.store('c', 0, 1, EXACT, 3, 'East')
+    assert table.lookup('c', 0, 1) == (EXACT, 3, 'East')
+    assert table.lookup('b', 0, 1) == (EXACT, 2, 'South')
+    assert table.bestAction('a', 0) is None
+    table.clear()
+    assert table.bestAction('c', 0) is None
+
+
+@pytest.mark.parametrize('name,depth', LAYOUTS)
+def test_values_with_and_without_table(name, depth):
+    for state in game_states(name, 10):
+        plain = make_agent(MinimaxAgent, depth)
+        expected = search_value(plain, plain.minimaxValue, state)[0]
+        alphaBeta = make_agent(AlphaBetaAgent, depth)
+        assert search_value(alphaBeta, alphaBeta.alphaBeta, state)[0] == expected
+        # A table of one bucket keeps replacing its entries
+        for tableSize in ('1', '4096'):
+            minimax = make_agent(MinimaxAgent, depth, tableSize=tableSize)
+            assert search_value(minimax, minimax.minimaxValue, state)[0] == expected
+            alphaBeta = make_agent(AlphaBetaAgent, depth, tableSize=tableSize)
+            assert search_value(alphaBeta, alphaBeta.alphaBeta, state)[0] == expected
+
+
+@pytest.mark.parametrize('name,depth', LAYOUTS)
+def test_bounds_from_narrow_windows(name, depth):
+    """
+    Searches with windows above and below the value of the state leave upper
+    and lower bounds in the table, which a search with the full window must
+    only use where they prove a cutoff.
+    """
+    for state in game_states(name, 10):
+        plain = make_agent(MinimaxAgent, depth)
+        expected = search_value(plain, plain.minimaxValue, state)[0]
+        for tableSize in ('1', '4096'):
+            agent = make_agent(AlphaBetaAgent, depth, tableSize=tableSize)
+            agent.startSearch()
+            agent.rootState = state
+            agent.rootActions = state.getLegalActions(0)
+            agent.rootDepth = depth
+            value = agent.alphaBeta(state, 0, depth, expected + 1, expected + 20)[0]
+            assert expected <= value < expected + 1
+            value = agent.alphaBeta(state, 0, depth, expected - 20, expected - 1)[0]
+            assert expected - 1 < value <= expected
+            assert agent.alphaBeta(state, 0, depth)[0] == expected
+
+
+@pytest.mark.parametrize('name,depth', LAYOUTS)
+@pytest.mark.parametrize('evaluation', ['score', 'spread'])
+def test_ordering_keeps_action_and_value(name, depth, evaluation):
+    for state in game_states(name, 10):
+        results = []
+        for options in ({'tableSize': '4096'}, {'tableSize': '4096', 'ordering': 'True'},
+                        {'ordering': 'True'}, {'tableSize': '1', 'ordering': 'True'}):
+            agent = AlphaBetaAgent(depth=str(depth), **options)
+            if evaluation == 'spread':
+                agent.evaluationFunction = spread_evaluation
+            action = agent.getAction(state)
+            results.append((action, agent.rootValue))
+        minimax = MinimaxAgent(depth=str(depth), tableSize='4096')
+        if evaluation == 'spread':
+            minimax.evaluationFunction = spread_evaluation
+        results.append((minimax.getAction(state), minimax.rootValue))
+        assert results == [results[0]] * len(results)
+
+
+def test_history_is_halved_and_pruned():
+    agent = AlphaBetaAgent(depth='2', tableSize='4096', ordering='True')
+    agent.history = {(0, (-1, -1), 'North'): 1, (0, (-1, -1), 'South'): 6}
+    agent.getAction(game_states('smallClassic', 1)[0])
+    assert (0, (-1, -1), 'North') not in agent.history
+    assert agent.history[0, (-1, -1), 'South'] == 3
+    assert all(score > 0 for score in agent.history.values())
@@ -0,0 +1,97 @@
+# Regression checks for the successors of pacman.GameState
+#
+# A successor shares the food grid, the capsule list and the agent states
+# of its predecessor, and only copies what its move changes. Every
+# successor of the states of random games is generated, including moves
+# that eat food or a capsule and moves where Pacman and a ghost collide,
+# and the predecessor must be left as it was.
+#
+# Run with: python -m pytest multiagent/test_pacman.py
+
+import os
+import random
+
+import pytest
+
+import layout
+import pacman
+
+# A small layout where Pacman eats capsules and scared ghosts often
+CROWDED = ['%%%%%%%%',
+           '%o.G..o%',
+           '%.%%.%.%',
+           '%P..oG.%',
+           '%%%%%%%%']
+
+
+def load_layout(name):
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'layouts', name + '.lay')
+    with open(path) as f:
+        return layout.Layout([line.strip() for line in f])
+
+
+def snapshot(state):
+    """Returns everything a successor may change in the state."""
+    data = state.data
+    return (str(data.food), data.food.asList(), data.food.count(),
+            list(data.capsules), data.score, data.scoreChange,
+            list(data._eaten), data._foodEaten, data._capsuleEaten,
+            data._win, data._lose, data.zobrist,
+            [(agentState.configuration.pos,
+              agentState.configuration.direction, agentState.start.pos,
+              agentState.isPacman, agentState.scaredTimer,
+              agentState.numCarrying)
+             for agentState in data.agentStates],
+            str(state))
+
+
+def events(parent, child, agentIndex):
+    """Returns what the move from parent to child did."""
+    found = set()
+    if child.getNumFood() < parent.getNumFood():
+        found.add('food')
+    if len(child.getCapsules()) < len(parent.getCapsules()):
+        found.add('capsule')
+    if child.isLose():
+        found.add('death')
+    if any(child.data._eaten):
+        found.add('ghost eaten')
+    if agentIndex > 0:
+        found.add('ghost move')
+    return found
+
+
+@pytest.mark.parametrize('board', [layout.Layout(CROWDED),
+                                   load_layout('capsuleClassic'),
+                                   load_layout('smallClassic')],
+                         ids=['crowded', 'capsuleClassic', 'smallClassic'])
+def test_successors_leave_the_predecessor_unchanged(board):
+    seen = set()
+    for seed in range(20):
+        rng = random.Random(seed)
+        state = pacman.GameState()
+        state.initialize(board, 2)
+        agent = 0
+        while not (state.isWin() or state.isLose()):
+            before = snapshot(state)
+            successors = []
+            for action in state.getLegalActions(agent):
+                successor = state.generateSuccessor(agent, action)
+                seen |= events(state, successor, agent)
+                successors.append((successor, snapshot(successor)))
+                assert snapshot(state) == before, (seed, action)
+                # Moves from a successor must not change it, its
+                # predecessor or its siblings either
+                if not (successor.isWin() or successor.isLose()):
+                    nextAgent = (agent + 1) % state.getNumAgents()
+                    for nextAction in successor.getLegalActions(nextAgent):
+                        successor.generateSuccessor(nextAgent, nextAction)
+                    assert snapshot(state) == before, (seed, action)
+            for (successor, expected) in successors:
+                assert snapshot(successor) == expected, seed
+            state = rng.choice(successors)[0]
+            agent = (agent + 1) % state.getNumAgents()
+    if board.width == len(CROWDED[0]):
+        assert seen == {'food', 'capsule', 'death', 'ghost eaten',
+                        'ghost move'}
@@ -0,0 +1,43 @@
+# Regression checks for the Zobrist hash of GameStateData
+#
+# Random games are played on several layouts, and after every move the
+# hash kept up to date by updateHash must equal the one computed from
+# scratch.
+#
+# Run with: python -m pytest multiagent/test_zobrist.py
+
+import os
+import random
+
+import pytest
+
+import layout
+import pacman
+
+LAYOUTS = ('smallClassic', 'mediumClassic', 'capsuleClassic',
+           'powerClassic', 'openClassic', 'trickyClassic', 'minimaxClassic')
+
+
+def load_layout(name):
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'layouts', name + '.lay')
+    with open(path) as f:
+        return layout.Layout([line.strip() for line in f])
+
+
+@pytest.mark.parametrize('name', LAYOUTS)
+def test_incremental_hash(name):
+    board = load_layout(name)
+    for seed in range(10):
+        rng = random.Random(seed)
+        state = pacman.GameState()
+        state.initialize(board, 4)
+        agent = 0
+        while not (state.isWin() or state.isLose()):
+            assert state.data.zobrist == state.data.computeHash(), seed
+            copy = state.deepCopy()
+            assert copy == state and hash(copy) == hash(state), seed
+            action = rng.choice(state.getLegalActions(agent))
+            state = state.generateSuccessor(agent, action)
+            agent = (agent + 1) % state.getNumAgents()
+        assert state.data.zobrist == state.data.computeHash(), seed